@@ -1,11 +1,16 @@
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
 import torch
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from transformers import AutoConfig, AutoModelForSequenceClassification
 
 from prmpt.metric.base import Metric
+from prmpt.runtime import registry
 
 class BERTMetric(Metric):
     """
     BERTMetric is a metric that calculates precision, recall, and F1 score based on BERT embeddings.
+    The embeddings are taken from the second to last layer, so the model is loaded without its last layer.
     It inherits from the Metric base class.
 
     Example:
@@ -13,13 +18,121 @@ class BERTMetric(Metric):
         >>> metric = BERTScoreMetric()
         >>> res = metric("default prompt...", "compressed prompt...")
     """
-    def __init__(self):
+    def __init__(
+        self,
+        model_name: str = "bert-base-uncased",
+        backend: str = "torch",
+        backend_cache_dir: Optional[str] = None,
+        batch_size: int = 16,
+    ):
+        """
+        Initializes the BERTMetric.
+
+        Args:
+            model_name (str, optional): The name of the pretrained BERT model. Defaults to "bert-base-uncased".
+            backend (str, optional): The inference backend, one of `"torch"`, `"torch-int8"` or `"onnx"`. Defaults to `"torch"`.
+            backend_cache_dir (str, optional): The directory of the converted `"torch-int8"`/`"onnx"` models. Defaults to `~/.cache/prmpt/backends`.
+            batch_size (int, optional): The maximum number of text pairs scored in one forward pass. Defaults to `16`.
+        """
         super().__init__()
-        self.tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
-        self.model = AutoModelForSequenceClassification.from_pretrained(
-            "bert-base-uncased", num_labels=2
+        self.model_name = model_name
+        self.backend = backend
+        self.backend_cache_dir = backend_cache_dir
+        self.batch_size = batch_size
+        self._num_hidden_layers = None
+
+    @property
+    def model(self):
+        """
+        The BERT model without its last layer, loaded on first use and shared through the model registry.
+        """
+        if self._num_hidden_layers is None:
+            config = AutoConfig.from_pretrained(self.model_name)
+            self._num_hidden_layers = max(config.num_hidden_layers - 1, 0)
+        return registry.get(
+            self.model_name,
+            AutoModelForSequenceClassification,
+            backend=self.backend,
+            cache_dir=self.backend_cache_dir,
+            output_names=("hidden_states",),
+            num_labels=2,
+            num_hidden_layers=self._num_hidden_layers,
         )
 
+    @property
+    def tokenizer(self):
+        """
+        The BERT tokenizer, loaded on first use and shared through the model registry.
+        """
+        return registry.get_tokenizer(self.model_name)
+
+    def scores(self, pairs: List[Tuple[str, str]]) -> List[dict]:
+        """
+        Calculates the BERT scores of several text pairs in batches.
+
+        The texts are tokenized at once, and the pairs are sorted by length and grouped into batches of
+        `batch_size` pairs, so each batch is padded to the length of its longest member only. Each pair
+        compares the token embeddings position by position up to the length of its longer text, as if
+        the two texts were padded to each other only.
+
+        Args:
+            pairs (List[Tuple[str, str]]): The texts before and after the modification.
+
+        Returns:
+            List[dict]: The precision, recall, and F1 score of each pair, in order.
+        """
+        if not pairs:
+            return []
+
+        texts = [text for pair in pairs for text in pair]
+        all_input_ids = self.tokenizer(texts, truncation=True)["input_ids"]
+        lengths = [
+            max(len(all_input_ids[2 * i]), len(all_input_ids[2 * i + 1]))
+            for i in range(len(pairs))
+        ]
+        order = sorted(range(len(pairs)), key=lambda i: lengths[i], reverse=True)
+        pad_token_id = self.tokenizer.pad_token_id or 0
+
+        results = [None] * len(pairs)
+        for b_start in range(0, len(order), self.batch_size):
+            b_idxs = order[b_start : b_start + self.batch_size]
+            max_len = lengths[b_idxs[0]]
+            input_ids = torch.full((2 * len(b_idxs), max_len), pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros((2 * len(b_idxs), max_len), dtype=torch.long)
+            for row, idx in enumerate(i for idx in b_idxs for i in (2 * idx, 2 * idx + 1)):
+                ids = all_input_ids[idx]
+                input_ids[row, : len(ids)] = torch.tensor(ids, dtype=torch.long)
+                attention_mask[row, : len(ids)] = 1
+
+            with torch.inference_mode():
+                outputs = self.model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    output_hidden_states=True,
+                )
+                embeddings = outputs.hidden_states[-1].float()
+                cos_sim = torch.nn.functional.cosine_similarity(
+                    embeddings[0::2], embeddings[1::2], dim=-1
+                )
+                mask = torch.arange(max_len)[None] < torch.tensor(
+                    [lengths[idx] for idx in b_idxs]
+                )[:, None]
+                precisions = (cos_sim * mask).sum(-1) / mask.sum(-1)
+                recalls = cos_sim.masked_fill(~mask, float("-inf")).max(-1).values
+
+            for idx, precision, recall in zip(b_idxs, precisions.tolist(), recalls.tolist()):
+                f1 = (
+                    2 * precision * recall / (precision + recall)
+                    if precision + recall != 0
+                    else 0.0
+                )
+                results[idx] = {
+                    "bert_score_precision": precision,
+                    "bert_score_recall": recall,
+                    "bert_score_f1": f1,
+                }
+        return results
+
     def run(self, prompt_before: str, prompt_after: str) -> dict:
         """
         Calculates precision, recall, and F1 score based on BERT embeddings.
@@ -31,26 +144,34 @@ class BERTMetric(Metric):
         Returns:
             dict: A dictionary containing the precision, recall, and F1 score.
         """
-        inputs = self.tokenizer(
-            [prompt_before, prompt_after],
-            return_tensors="pt",
-            padding=True,
-            truncation=True,
-        )
-        outputs = self.model(**inputs, output_hidden_states=True)
-        embedding1 = outputs.hidden_states[-2][0]
-        embedding2 = outputs.hidden_states[-2][1]
-        cos_sim = torch.nn.functional.cosine_similarity(embedding1, embedding2)
-        precision, recall, f1 = (
-            cos_sim.mean().item(),
-            cos_sim.max().item(),
-            2
-            * cos_sim.mean().item()
-            * cos_sim.max().item()
-            / (cos_sim.mean().item() + cos_sim.max().item()),
+        return self.scores([(prompt_before, prompt_after)])[0]
+
+    def batch_run(
+        self,
+        prompts_before: list,
+        prompts_after: list,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> dict:
+        """
+        Calculates the average BERT scores of a batch of prompts, scoring them in batches with `scores`.
+
+        Args:
+            prompts_before (list): List of prompts before the modification.
+            prompts_after (list): List of prompts after the modification.
+            skip_system (bool, optional): Whether to skip prompts with "system" role. Defaults to False.
+            json (bool, optional): Whether the prompts are JSON data. Defaults to False.
+            langchain (bool, optional): Whether the prompts are langchain chat data. Defaults to False.
+
+        Returns:
+            dict: A dictionary containing the average precision, recall, and F1 score, empty if every prompt is skipped.
+        """
+        results = self.scores(
+            self.text_pairs(prompts_before, prompts_after, skip_system, json, langchain)
         )
-        return {
-            "bert_score_precision": precision,
-            "bert_score_recall": recall,
-            "bert_score_f1": f1,
-        }
\ No newline at end of file
+        avg_m = defaultdict(float)
+        for res in results:
+            for key in res:
+                avg_m[key] += res[key] / len(results)
+        return avg_m
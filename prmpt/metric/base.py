@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from typing import List, Tuple, Union
+
+from prmpt.utils import content_texts
 
 class Metric(ABC):
     def __init__(self):
@@ -30,19 +33,37 @@ class Metric(ABC):
         Returns:
             dict: The result of the metric computation.
         """
-        res = self.run(json_data_before["content"], json_data_after["content"])
+        res = self.run(
+            self.content_text(json_data_before["content"]),
+            self.content_text(json_data_after["content"]),
+        )
         return res
+
+    @staticmethod
+    def content_text(content: Union[str, list]) -> str:
+        """
+        Returns the text of chat message content, joining the text parts of list content.
+
+        Args:
+            content (Union[str, list]): The message content, a string or a list of content parts.
+
+        Returns:
+            str: The text.
+        """
+        if isinstance(content, str):
+            return content
+        return "\n".join(content_texts(content))
     
-    def batch_run(
+    def text_pairs(
         self,
         prompts_before: list,
         prompts_after: list,
         skip_system: bool = False,
         json: bool = False,
         langchain: bool = False,
-    ) -> float:
+    ) -> List[Tuple[str, str]]:
         """
-        Runs the metric on a batch of prompts.
+        Collects the texts before and after the modification of a batch of prompts.
 
         Args:
             prompts_before (list): List of prompts before the modification.
@@ -52,34 +73,55 @@ class Metric(ABC):
             langchain (bool, optional): Whether the prompts are langchain chat data. Defaults to False.
 
         Returns:
-            float: The average metric value across the batch.
+            List[Tuple[str, str]]: The text before and after of every prompt that is not skipped.
         """
-        avg_m = defaultdict(float)
-        n = 0
+        pairs = []
         for pb, pa in zip(prompts_before, prompts_after):
             if json:
                 if skip_system and pb["role"] == "system":
                     continue
-                else:
-                    res = self.run_json(pb, pa)
-                    n += 1
+                pairs.append((self.content_text(pb["content"]), self.content_text(pa["content"])))
 
             elif langchain:
                 if skip_system and pb.role == "system":
                     continue
-                else:
-                    res = self.run(pb.content, pa.content)
-                    n += 1
+                pairs.append((self.content_text(pb.content), self.content_text(pa.content)))
 
             else:
-                res = self.run(pb, pa)
-                n += 1
+                pairs.append((pb, pa))
+        return pairs
+
+    def batch_run(
+        self,
+        prompts_before: list,
+        prompts_after: list,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> float:
+        """
+        Runs the metric on a batch of prompts.
+
+        Args:
+            prompts_before (list): List of prompts before the modification.
+            prompts_after (list): List of prompts after the modification.
+            skip_system (bool, optional): Whether to skip prompts with "system" role. Defaults to False.
+            json (bool, optional): Whether the prompts are JSON data. Defaults to False.
+            langchain (bool, optional): Whether the prompts are langchain chat data. Defaults to False.
 
+        Returns:
+            float: The average metric value across the batch.
+        """
+        pairs = self.text_pairs(prompts_before, prompts_after, skip_system, json, langchain)
+
+        avg_m = defaultdict(float)
+        for pb, pa in pairs:
+            res = self.run(pb, pa)
             for key in res:
                 avg_m[key] += res[key]
 
         for key in avg_m:
-            avg_m[key] /= n
+            avg_m[key] /= len(pairs)
 
         return avg_m
 
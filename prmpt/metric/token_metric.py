@@ -1,3 +1,8 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List
+
 import tiktoken
 
 from prmpt.metric.base import Metric
@@ -5,7 +10,9 @@ from prmpt.metric.base import Metric
 class TokenMetric(Metric):
     """
     TokenMetric is a metric that calculates the compression ratio based on the number of tokens reduced.
-    It uses `tiktoken` to tokenize strings and count the number of tokens.
+    It uses `tiktoken` to tokenize strings and count the number of tokens. Only counts are computed,
+    batches are encoded with tiktoken's multi-threaded batch encoding, and the counts of original prompts
+    are memoized by digest, as the same prompts are usually measured again and again.
 
     It inherits from the Metric base class.
 
@@ -15,16 +22,107 @@ class TokenMetric(Metric):
         >>> res = metric("default prompt...", "compressed prompt...")
     """
     
-    def __init__(self, tokenizer: str = "cl100k_base"):
+    def __init__(
+        self, tokenizer: str = "cl100k_base", num_threads: int = 8, memo_size: int = 10000
+    ):
         """
         Initializes the TokenMetric.
 
         Args:
             tokenizer (str, optional): The tokenizer to use. Defaults to "cl100k_base".
+            num_threads (int, optional): The number of threads used to encode batches. Defaults to `8`.
+            memo_size (int, optional): The maximum number of original prompt counts kept in memory. Defaults to `10000`.
         """
         super().__init__()
         self.tokenizer = tiktoken.get_encoding(tokenizer)
         self.key = "num_token_comp_ratio"
+        self.num_threads = num_threads
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """
+        Counts the tokens of a text. Special token strings are counted as ordinary text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            int: The number of tokens.
+        """
+        return len(self.tokenizer.encode_ordinary(text))
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        """
+        Counts the tokens of several texts with one multi-threaded batch encoding.
+
+        Args:
+            texts (List[str]): The texts.
+
+        Returns:
+            List[int]: The number of tokens of each text.
+        """
+        if len(texts) == 1:
+            return [self.count(texts[0])]
+        encoded = self.tokenizer.encode_ordinary_batch(texts, num_threads=self.num_threads)
+        return [len(tokens) for tokens in encoded]
+
+    @staticmethod
+    def memo_key(text: str) -> bytes:
+        """
+        Returns the memo key of an original prompt, a digest so the memo never keeps prompts alive.
+
+        Args:
+            text (str): The original prompt text.
+
+        Returns:
+            bytes: The key.
+        """
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+
+    def count_originals(self, texts: List[str]) -> List[int]:
+        """
+        Counts the tokens of original prompts, reusing the counts memoized by earlier calls.
+
+        Args:
+            texts (List[str]): The original prompt texts.
+
+        Returns:
+            List[int]: The number of tokens of each text.
+        """
+        keys = [self.memo_key(text) for text in texts]
+        counts = {}
+        with self._lock:
+            for key in keys:
+                if key in self.memo:
+                    self.memo.move_to_end(key)
+                    counts[key] = self.memo[key]
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in counts}
+        if missing:
+            counts.update(zip(missing, self.count_batch(list(missing.values()))))
+            with self._lock:
+                for key in missing:
+                    self.memo[key] = counts[key]
+                while len(self.memo) > self.memo_size:
+                    self.memo.popitem(last=False)
+        return [counts[key] for key in keys]
+
+    def comp_ratio(self, n_tokens_before: int, n_tokens_after: int) -> float:
+        """
+        Computes the compression ratio from token counts, `0.0` for an empty original prompt.
+
+        Args:
+            n_tokens_before (int): The number of tokens before compression.
+            n_tokens_after (int): The number of tokens after compression.
+
+        Returns:
+            float: The compression ratio.
+        """
+        if n_tokens_before == 0:
+            return 0.0
+        return (n_tokens_before - n_tokens_after) / n_tokens_before
 
     def run(self, prompt_before: str, prompt_after: str) -> dict:
         """
@@ -37,10 +135,43 @@ class TokenMetric(Metric):
         Returns:
             dict: A dictionary containing the compression ratio.
         """
-        n_tokens_before = len(self.tokenizer.encode(prompt_before))
-        n_tokens_after = len(self.tokenizer.encode(prompt_after))
-        comp_ratio = (n_tokens_before - n_tokens_after) / n_tokens_before
-        return {self.key: comp_ratio}
+        (n_tokens_before,) = self.count_originals([prompt_before])
+        n_tokens_after = self.count(prompt_after)
+        return {self.key: self.comp_ratio(n_tokens_before, n_tokens_after)}
+
+    def batch_run(
+        self,
+        prompts_before: list,
+        prompts_after: list,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> dict:
+        """
+        Calculates the average compression ratio of a batch of prompts, counting all the tokens with two
+        batch encodings.
+
+        Args:
+            prompts_before (list): List of prompts before the modification.
+            prompts_after (list): List of prompts after the modification.
+            skip_system (bool, optional): Whether to skip prompts with "system" role. Defaults to False.
+            json (bool, optional): Whether the prompts are JSON data. Defaults to False.
+            langchain (bool, optional): Whether the prompts are langchain chat data. Defaults to False.
+
+        Returns:
+            dict: A dictionary containing the average compression ratio, empty if every prompt is skipped.
+        """
+        pairs = self.text_pairs(prompts_before, prompts_after, skip_system, json, langchain)
+        if not pairs:
+            return {}
+
+        counts_before = self.count_originals([pb for pb, _ in pairs])
+        counts_after = self.count_batch([pa for _, pa in pairs])
+        comp_ratios = [
+            self.comp_ratio(n_before, n_after)
+            for n_before, n_after in zip(counts_before, counts_after)
+        ]
+        return {self.key: sum(comp_ratios) / len(comp_ratios)}
 
     def __call__(self, prompt_before: str, prompt_after: str) -> dict:
         """
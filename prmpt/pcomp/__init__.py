@@ -1,19 +1,35 @@
 import logging
 
 from prmpt.pcomp.autocorrect_comp import AutocorrectComp
+from prmpt.pcomp.causal_entropy_comp import CausalEntropyComp
 from prmpt.pcomp.entropy_comp import EntropyComp
+from prmpt.pcomp.fused_rule_comp import FusedRuleComp
 from prmpt.pcomp.lemmatizer_comp import LemmatizerComp
 from prmpt.pcomp.base import PromptComp
+from prmpt.pcomp.conversation import ConversationCompressor
+from prmpt.pcomp.cache import MemoryCache, ResultCache, SQLiteCache, SurprisalCache
 from prmpt.pcomp.punctuation_comp import PunctuationComp
-from prmpt.pcomp.sequential import Sequential
+from prmpt.pcomp.resources import LemmaTable, SpellerDictionary, ensure_nltk_resource
+from prmpt.pcomp.sequential import CompiledSequential, Sequential
 
 __all__ = [
     "PromptComp",
     "AutocorrectComp",
     "LemmatizerComp",
     "EntropyComp",
-    "PunctuationComp"
+    "CausalEntropyComp",
+    "PunctuationComp",
+    "FusedRuleComp",
     "Sequential",
+    "CompiledSequential",
+    "ConversationCompressor",
+    "MemoryCache",
+    "ResultCache",
+    "SQLiteCache",
+    "SurprisalCache",
+    "LemmaTable",
+    "SpellerDictionary",
+    "ensure_nltk_resource",
 ]
 
 logger = logging.getLogger(__name__)
\ No newline at end of file
@@ -1,6 +1,14 @@
-from autocorrect import Speller
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from autocorrect import Speller, load_from_tar
+from autocorrect.constants import word_regexes
 
 from prmpt.pcomp.base import PromptComp
+from prmpt.pcomp.resources import SpellerDictionary
 
 class AutocorrectComp(PromptComp):
     """
@@ -8,6 +16,11 @@ class AutocorrectComp(PromptComp):
     Correctly spelled words have less token count than incorrect ones. This is useful in scenarios where
     human client types the text.
 
+    Words found in the speller dictionary are kept as they are without generating correction candidates,
+    and the corrections of the other words are memoized in a bounded LRU cache. With `dictionary_path` the
+    speller dictionary is snapshotted once to a memory-mapped file, which later constructions open without
+    parsing.
+
     It inherits from the PromptComp base class.
 
     Example:
@@ -17,7 +30,15 @@ class AutocorrectComp(PromptComp):
         >>> compressed_prompt = res.content
     """
 
-    def __init__(self, fast: bool = False, verbose: bool = False, metrics: list = []):
+    def __init__(
+        self,
+        fast: bool = False,
+        verbose: bool = False,
+        metrics: list = [],
+        memo_size: int = 100000,
+        dictionary_path: Optional[str] = None,
+        **kwargs,
+    ):
         """
         Initializes the AutocorrectComp.
 
@@ -25,9 +46,108 @@ class AutocorrectComp(PromptComp):
             fast (bool, optional): Flag indicating whether to use a fast autocorrect implementation. Defaults to False.
             verbose (bool, optional): Flag indicating whether to enable verbose output. Defaults to False.
             metrics (list, optional): A list of metric names to evaluate during compression. Defaults to an empty list.
+            memo_size (int, optional): The maximum number of word corrections memoized. Defaults to `100000`.
+            dictionary_path (str, optional): The speller dictionary snapshot, written on first use. Defaults to `None` i.e. the dictionary is parsed on every construction.
+        """
+        super().__init__(verbose, metrics, **kwargs)
+        self.fast = fast
+        self.dictionary_path = dictionary_path
+        if dictionary_path is None:
+            self.spell = Speller(lang="en", fast=fast)
+            self.known_words = frozenset(self.spell.nlp_data)
+        else:
+            if os.path.exists(os.path.expanduser(dictionary_path)):
+                nlp_data = SpellerDictionary(dictionary_path)
+            else:
+                nlp_data = SpellerDictionary.build(load_from_tar("en"), dictionary_path)
+            self.spell = Speller(lang="en", fast=fast, nlp_data=nlp_data)
+            self.known_words = nlp_data
+        self.word_regex = re.compile(word_regexes[self.spell.lang])
+
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self.known_hits = 0
+        self._lock = threading.Lock()
+
+    def get_config(self) -> dict:
+        """
+        Returns the constructor arguments that rebuild the compressor, see `PromptComp.get_config`.
+
+        Returns:
+            dict: The arguments by name.
+        """
+        return {
+            **super().get_config(),
+            "fast": self.fast,
+            "memo_size": self.memo_size,
+            "dictionary_path": self.dictionary_path,
+        }
+
+    def is_known(self, word: str) -> bool:
+        """
+        Checks whether the speller would keep a word unchanged because every part of it is a dictionary word.
+        A capitalized word is only known if its decapitalized form is known too, as the speller weighs both.
+
+        Args:
+            word (str): The word.
+
+        Returns:
+            bool: Whether the word is known.
+        """
+        for match in self.word_regex.findall(word):
+            if match not in self.known_words:
+                return False
+            if match[0].isupper() and match[0].lower() + match[1:] not in self.known_words:
+                return False
+        return True
+
+    def correct(self, word: str) -> str:
+        """
+        Autocorrects a word, skipping known words and going through the correction memo.
+
+        Args:
+            word (str): The word.
+
+        Returns:
+            str: The corrected word.
+        """
+        if self.is_known(word):
+            with self._lock:
+                self.known_hits += 1
+            return word
+
+        with self._lock:
+            corrected = self.memo.get(word)
+            if corrected is not None:
+                self.memo_hits += 1
+                self.memo.move_to_end(word)
+                return corrected
+            self.memo_misses += 1
+
+        corrected = self.spell(word)
+        with self._lock:
+            self.memo[word] = corrected
+            if len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        return corrected
+
+    def memo_stats(self) -> dict:
+        """
+        Returns the known word and correction memo counters.
+
+        Returns:
+            dict: The known word count, the memo hit and miss counts, the hit rate over all words and the number of memoized corrections.
         """
-        super().__init__(verbose, metrics)
-        self.spell = Speller(lang="en", fast=fast)
+        lookups = self.known_hits + self.memo_hits + self.memo_misses
+        return {
+            "known": self.known_hits,
+            "hits": self.memo_hits,
+            "misses": self.memo_misses,
+            "hit_rate": (self.known_hits + self.memo_hits) / lookups if lookups else 0.0,
+            "entries": len(self.memo),
+        }
 
     def compress(self, prompt: str) -> str:
         """
@@ -40,6 +160,6 @@ class AutocorrectComp(PromptComp):
             str: The compressed prompt text after applying autocorrection.
         """
         words = prompt.split()
-        autocorrected_words = [self.spell(word) for word in words]
+        autocorrected_words = [self.correct(word) for word in words]
         comp_prompt = " ".join(autocorrected_words)
         return comp_prompt
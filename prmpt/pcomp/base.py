@@ -1,8 +1,24 @@
+import asyncio
 import copy
+import re
 from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from typing import Iterable, Iterator, List, Optional, Tuple
 
+from .batching import MicroBatcher
+from .cache import ResultCache, comp_fingerprint
 from .logger import logger
-from .utils import DotDict, protected_runner
+from .parallel import compress_many
+from .utils import (
+    DotDict,
+    content_texts,
+    protected_batch_runner,
+    protected_runner,
+    replace_content_texts,
+    stream_protect_tags,
+)
+
+WHITESPACE = re.compile(r"\s+")
 
 class PromptComp(ABC):
     """
@@ -10,19 +26,29 @@ class PromptComp(ABC):
     It defines the common structure and interface for prompt compression.
     This class inherits from ABC (Abstract Base Class).
     """
-    
-    def __init__(self, verbose: bool = False, metrics: list = [], protect_tag: str = None):
+
+    def __init__(
+        self,
+        verbose: bool = False,
+        metrics: list = [],
+        protect_tag: str = None,
+        result_cache: Optional[ResultCache] = None,
+    ):
         """
         Initializes the PromptComp.
 
         Args:
             verbose (bool, optional): Flag indicating whether to enable verbose output. Defaults to False.
             metrics (list, optional): A list of metric names to evaluate during compression. Defaults to an empty list.
-            protect_tag (str, optional): markup style tag string to indicate protected content that can't be deleted or modified. Defaults to `None`.
+            protect_tag (str, optional): markup style tag string to indicate protected content that can't be deleted or modified, or a sequence of such tags. A self-closing `<tag/>` marker is kept as it is. Defaults to `None`.
+            result_cache (ResultCache, optional): A cache of compressed chunks, reused whenever `run` or `run_batch` sees the same chunk again with the same configuration. Defaults to `None` i.e. no caching.
         """
         self.verbose = verbose
         self.metrics = metrics
         self.protect_tag = protect_tag
+        self.result_cache = result_cache
+        self.batching = DotDict(max_batch_size=32, max_wait_ms=5.0, executor=None)
+        self._batchers = {}
 
     @abstractmethod
     def compress(self, prompt: str) -> str:
@@ -39,6 +65,134 @@ class PromptComp(ABC):
         """
         pass
 
+    def compress_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Runs the prompt compression technique on a list of prompts.
+
+        The default implementation calls `compress` once per prompt. Subclasses that can share work
+        across prompts (e.g. batched model inference) should override it.
+
+        Args:
+            prompts (List[str]): The prompt texts.
+
+        Returns:
+            List[str]: The compressed prompt texts, in the same order as `prompts`.
+        """
+        return [self.compress(prompt) for prompt in prompts]
+
+    def compress_segment(
+        self, segment: str, left_context: str = "", right_context: str = ""
+    ) -> str:
+        """
+        Compresses one segment of a streamed text, see `compress_stream`. The default implementation ignores
+        the context and calls `compress`; context-dependent compressors should override it.
+
+        Args:
+            segment (str): The segment text.
+            left_context (str, optional): The original text right before the segment. Defaults to "".
+            right_context (str, optional): The original text right after the segment. Defaults to "".
+
+        Returns:
+            str: The compressed segment text.
+        """
+        return self.compress(segment)
+
+    def compress_stream(
+        self,
+        chunks: Iterable[str],
+        segment_chars: int = 16384,
+        context_chars: int = 1024,
+    ) -> Iterator[str]:
+        """
+        Compresses text arriving in chunks, e.g. a multi-megabyte transcript read line by line, in bounded
+        memory. Protect tags are parsed as the text arrives, even when a tag is split across chunks, and
+        protected text is passed through as soon as it is read.
+
+        Unprotected text is compressed in segments of about `segment_chars` characters, cut at whitespace
+        (or anywhere in text without whitespace), which is kept as it is between segments. Each segment is compressed with up to `context_chars` of the
+        original text on both sides as context, see `compress_segment`.
+
+        Args:
+            chunks (Iterable[str]): The text chunks.
+            segment_chars (int, optional): The segment size in characters. Defaults to `16384`.
+            context_chars (int, optional): The context size in characters on each side of a segment. Defaults to `1024`.
+
+        Yields:
+            str: The compressed text pieces, in order.
+
+        Raises:
+            ParseError: If the protect tags are invalid.
+        """
+        pending = ""
+        left_context = ""
+        for text, protected in stream_protect_tags(chunks, self.protect_tag):
+            if protected:
+                if pending:
+                    yield self.compress_segment(pending, left_context)
+                pending = left_context = ""
+                if text:
+                    yield text
+                continue
+
+            pending += text
+            while len(pending) > segment_chars + context_chars:
+                cut = None
+                for cut in WHITESPACE.finditer(pending, 1, segment_chars):
+                    pass
+                cut = cut or WHITESPACE.search(pending, segment_chars)
+                if cut is None:
+                    start = end = segment_chars
+                else:
+                    cut = WHITESPACE.match(pending, cut.start())
+                    start, end = cut.span()
+                segment, rest = pending[:start], pending[end:]
+                yield self.compress_segment(
+                    segment, left_context, rest[:context_chars]
+                ) + pending[start:end]
+                left_context = segment[-context_chars:]
+                pending = rest
+
+        if pending:
+            yield self.compress_segment(pending, left_context)
+
+    def get_config(self) -> dict:
+        """
+        Returns the constructor arguments that rebuild the compressor, see `from_config`. Subclasses add
+        their own arguments to the base ones.
+
+        Returns:
+            dict: The arguments by name.
+        """
+        return {
+            "verbose": self.verbose,
+            "metrics": self.metrics,
+            "protect_tag": self.protect_tag,
+            "result_cache": self.result_cache,
+        }
+
+    @classmethod
+    def from_config(cls, config: dict) -> "PromptComp":
+        """
+        Builds a compressor from the arguments returned by `get_config`.
+
+        Args:
+            config (dict): The constructor arguments by name.
+
+        Returns:
+            PromptComp: The compressor.
+        """
+        return cls(**config)
+
+    def fingerprint(self) -> str:
+        """
+        Returns the fingerprint of the compressor configuration that keys its `result_cache` entries,
+        see `comp_fingerprint`.
+
+        Returns:
+            str: The fingerprint.
+        """
+        return comp_fingerprint(self)
+
     @protected_runner
     def run(self, prompt: str) -> str:
         """
@@ -51,29 +205,42 @@ class PromptComp(ABC):
             str: The protected compressed prompt text.
         """
         return self.compress(prompt)
+
+    @protected_batch_runner
+    def run_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Wrapper around `compress_batch` to do protected compression of several prompts at once.
+
+        Args:
+            prompts (List[str]): The prompt texts.
+
+        Returns:
+            List[str]: The protected compressed prompt texts.
+        """
+        return self.compress_batch(prompts)
     
-    def run_json(self, json_data: list, skip_system: bool = False) -> dict:
+    def run_json(self, json_data: list, skip_system: bool = False) -> list:
         """
         Applies prompt compression to the JSON request object.
 
+        The data is copied on write: only the messages whose content changes are copied, and everything else
+        (other fields, unchanged messages, image parts) is shared with `json_data`.
+
         Args:
-            json_data (dict): The JSON data object.
+            json_data (list): The list of chat messages with "role" and "content" fields.
+            skip_system (bool, optional): Whether to skip messages with role 'system'. Defaults to False.
 
         Returns:
-            dict: The JSON data object with the content field replaced by the compressed prompt text.
+            list: The JSON data object with the content field replaced by the compressed prompt text.
         """
-        comp_json_data = copy.deepcopy(json_data)
+        return self.run_messages(json_data, skip_system, langchain=False)
 
-        for data in comp_json_data:
-            if skip_system and data["role"] == "system":
-                continue
-            data["content"] = self.run(data["content"])
-        return comp_json_data
-    
-    def run_langchain(self, langchain_data: list, skip_system: bool = False):
+    def run_langchain(self, langchain_data: list, skip_system: bool = False) -> list:
         """
         Runs the PromptComp on langchain chat data.
 
+        The data is copied on write: only the messages whose content changes are copied.
+
         Args:
             langchain_data (list): The langchain data containing 'type' and 'content' fields.
             skip_system (bool, optional): Whether to skip data with type 'system'. Defaults to False.
@@ -82,16 +249,81 @@ class PromptComp(ABC):
             list: The modified langchain data.
 
         """
+        return self.run_messages(langchain_data, skip_system, langchain=True)
+
+    def run_messages(
+        self, messages: list, skip_system: bool = False, langchain: bool = False
+    ) -> list:
+        """
+        Compresses the text of JSON or langchain chat messages with one `run_batch` call.
+
+        Args:
+            messages (list): The chat messages.
+            skip_system (bool, optional): Whether to skip system messages. Defaults to False.
+            langchain (bool, optional): Whether the messages are langchain messages. Defaults to False.
+
+        Returns:
+            list: The messages, the changed ones replaced by copies with the compressed content.
+        """
+        targets = self.message_targets(messages, skip_system, langchain)
+        comp_texts = self.run_batch([text for _, texts in targets for text in texts])
+        return self.replace_messages(messages, targets, comp_texts, langchain)
 
-        comp_langchain_data = copy.deepcopy(langchain_data)
+    def message_targets(
+        self, messages: list, skip_system: bool = False, langchain: bool = False
+    ) -> List[Tuple[int, List[str]]]:
+        """
+        Collects the texts to compress in chat messages.
+
+        Args:
+            messages (list): The chat messages.
+            skip_system (bool, optional): Whether to skip system messages. Defaults to False.
+            langchain (bool, optional): Whether the messages are langchain messages. Defaults to False.
+
+        Returns:
+            List[Tuple[int, List[str]]]: The index and the texts of every message to compress.
+        """
+        return [
+            (i, content_texts(self.message_content(data, langchain)))
+            for i, data in enumerate(messages)
+            if not (skip_system and self.message_role(data, langchain) == "system")
+        ]
+
+    def replace_messages(
+        self,
+        messages: list,
+        targets: List[Tuple[int, List[str]]],
+        comp_texts: List[str],
+        langchain: bool = False,
+    ) -> list:
+        """
+        Builds the compressed chat messages, copying only the messages whose texts changed.
+
+        Args:
+            messages (list): The chat messages.
+            targets (List[Tuple[int, List[str]]]): The message texts, see `message_targets`.
+            comp_texts (List[str]): The compressed texts of all targets, flattened in order.
+            langchain (bool, optional): Whether the messages are langchain messages. Defaults to False.
 
-        for data in comp_langchain_data:
-            if skip_system and data.type == "system":
+        Returns:
+            list: A new list of messages sharing the unchanged ones with `messages`.
+        """
+        comp_messages = list(messages)
+        comp_texts = iter(comp_texts)
+        for i, texts in targets:
+            new_texts = [next(comp_texts) for _ in texts]
+            if new_texts == texts:
                 continue
-            data.content = self.run(data.content)
+            data = messages[i]
+            content = replace_content_texts(self.message_content(data, langchain), new_texts)
+            if langchain:
+                data = copy.copy(data)
+                data.content = content
+            else:
+                data = {**data, "content": content}
+            comp_messages[i] = data
+        return comp_messages
 
-        return comp_langchain_data
-    
     def __call__(
         self,
         prompt_data: list,
@@ -116,6 +348,107 @@ class PromptComp(ABC):
 
         """
 
+        comp_prompt_data = self.run_data(prompt_data, skip_system, json, langchain)
+        return self.evaluate(prompt_data, comp_prompt_data, skip_system, json, langchain)
+
+    def run_data(
+        self,
+        prompt_data,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ):
+        """
+        Compresses prompt data like `__call__`, without computing the metrics.
+
+        Args:
+            prompt_data: The prompt text, or the chat messages in JSON/langchain mode.
+            skip_system: A boolean indicating whether to skip system prompts. Default is False.
+            json: A boolean indicating whether the prompt data is in JSON format. Default is False.
+            langchain: A boolean indicating whether the prompt data is in langchain format. Default is False.
+
+        Returns:
+            The compressed prompt data.
+        """
+        self.check_call_args(skip_system, json, langchain)
+
+        if json:
+            return self.run_json(prompt_data, skip_system)
+        elif langchain:
+            return self.run_langchain(prompt_data, skip_system)
+        return self.run(prompt_data)
+
+    def run_data_batch(
+        self,
+        prompts_data: list,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> list:
+        """
+        Compresses a list of prompt data, see `run_data`. Prompt texts are compressed together with `run_batch`.
+
+        Args:
+            prompts_data (list): The prompt texts, or the chats in JSON/langchain mode.
+            skip_system: A boolean indicating whether to skip system prompts. Default is False.
+            json: A boolean indicating whether the prompt data is in JSON format. Default is False.
+            langchain: A boolean indicating whether the prompt data is in langchain format. Default is False.
+
+        Returns:
+            list: The compressed prompt data, in order.
+        """
+        self.check_call_args(skip_system, json, langchain)
+
+        if json or langchain:
+            return [
+                self.run_data(prompt_data, skip_system, json, langchain)
+                for prompt_data in prompts_data
+            ]
+        return self.run_batch(list(prompts_data))
+
+    def compress_many(
+        self,
+        prompts_data: Iterable,
+        workers: int = 1,
+        executor: str = "thread",
+        chunksize: int = 16,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> list:
+        """
+        Compresses many prompts, or chats in JSON/langchain mode, across thread or process workers. Metrics
+        are not computed. Process workers build their own copy of the compressor once from its constructor
+        arguments.
+
+        Args:
+            prompts_data (Iterable): The prompts, or chats in JSON/langchain mode.
+            workers (int, optional): The number of workers. Defaults to `1` i.e. run in the calling thread.
+            executor (str, optional): The worker type, `"thread"` or `"process"`. Defaults to `"thread"`.
+            chunksize (int, optional): The number of prompts sent to a worker at once. Defaults to `16`.
+            skip_system: A boolean indicating whether to skip system prompts. Default is False.
+            json: A boolean indicating whether the prompt data is in JSON format. Default is False.
+            langchain: A boolean indicating whether the prompt data is in langchain format. Default is False.
+
+        Returns:
+            list: The compressed prompt data, in the order of `prompts_data`.
+        """
+        return compress_many(
+            self, prompts_data, workers, executor, chunksize, skip_system, json, langchain
+        )
+
+    def check_call_args(self, skip_system: bool, json: bool, langchain: bool) -> None:
+        """
+        Validates the data format arguments of `__call__`.
+
+        Args:
+            skip_system: A boolean indicating whether to skip system prompts.
+            json: A boolean indicating whether the prompt data is in JSON format.
+            langchain: A boolean indicating whether the prompt data is in langchain format.
+
+        Raises:
+            AssertionError: If both json and langchain are True, or skip_system is True and neither is.
+        """
         assert not (json and langchain), "Data type can't be both json and langchain"
 
         if skip_system:
@@ -123,13 +456,27 @@ class PromptComp(ABC):
                 json or langchain
             ), "Can't skip system prompts without batched json format"
 
-        if json:
-            comp_prompt_data = self.run_json(prompt_data, skip_system)
-        elif langchain:
-            comp_prompt_data = self.run_langchain(prompt_data, skip_system)
-        else:
-            comp_prompt_data = self.run(prompt_data)
+    def evaluate(
+        self,
+        prompt_data: list,
+        comp_prompt_data: list,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> DotDict:
+        """
+        Computes the metrics of a compression and packs the result.
 
+        Args:
+            prompt_data: The prompt data before compression.
+            comp_prompt_data: The prompt data after compression.
+            skip_system: A boolean indicating whether system prompts were skipped. Default is False.
+            json: A boolean indicating whether the prompt data is in JSON format. Default is False.
+            langchain: A boolean indicating whether the prompt data is in langchain format. Default is False.
+
+        Returns:
+            DotDict: The compressed prompt data as `content` and the metric results as `metrics`.
+        """
         metric_results = []
         for metric in self.metrics:
             if json or langchain:
@@ -147,9 +494,133 @@ class PromptComp(ABC):
             for metric_result in metric_results:
                 for key in metric_result:
                     logger.info(f"{key}: {metric_result[key]:.3f}")
+            if self.result_cache is not None:
+                logger.info(f"Result Cache: {self.result_cache.stats()}")
 
         result = DotDict()
         result.content = comp_prompt_data
         result.metrics = metric_results
 
         return result
+
+    def configure_batching(
+        self,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+    ) -> "PromptComp":
+        """
+        Configures the micro-batching of the asyncio API (`acompress`, `arun`, `acall`).
+
+        Args:
+            max_batch_size (int, optional): The maximum number of prompts compressed in one batch. Defaults to `32`.
+            max_wait_ms (float, optional): The maximum time a prompt waits for others to join its batch, in milliseconds. Defaults to `5.0`.
+            executor (Executor, optional): The executor running the batches. Defaults to `None` i.e. a dedicated worker thread.
+
+        Returns:
+            PromptComp: The compressor itself.
+        """
+        self.batching = DotDict(
+            max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, executor=executor
+        )
+        self._batchers = {}
+        return self
+
+    def batcher(self, name: str) -> MicroBatcher:
+        """
+        Returns the micro-batcher running the batch method `name`, creating it on first use.
+
+        Args:
+            name (str): The name of the batch method, `"compress_batch"` or `"run_batch"`.
+
+        Returns:
+            MicroBatcher: The micro-batcher.
+        """
+        if name not in self._batchers:
+            self._batchers[name] = MicroBatcher(getattr(self, name), **self.batching)
+        return self._batchers[name]
+
+    async def acompress(self, prompt: str) -> str:
+        """
+        Asynchronous `compress`. Concurrent calls are compressed together in micro-batches with
+        `compress_batch`, in a background thread.
+
+        Args:
+            prompt (str): The prompt text.
+
+        Returns:
+            str: The compressed prompt text.
+        """
+        return await self.batcher("compress_batch").submit(prompt)
+
+    async def arun(self, prompt: str) -> str:
+        """
+        Asynchronous `run`. Concurrent calls are compressed together in micro-batches with `run_batch`,
+        in a background thread.
+
+        Args:
+            prompt (str): The prompt text.
+
+        Returns:
+            str: The protected compressed prompt text.
+        """
+        return await self.batcher("run_batch").submit(prompt)
+
+    async def acall(
+        self,
+        prompt_data: list,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> DotDict:
+        """
+        Asynchronous `__call__`. The prompt or message contents join the micro-batches of concurrent calls,
+        and metrics are computed in a background thread, so the event loop is never blocked.
+
+        Args:
+            prompt_data: A list of prompt data.
+            skip_system: A boolean indicating whether to skip system prompts. Default is False.
+            json: A boolean indicating whether the prompt data is in JSON format. Default is False.
+            langchain: A boolean indicating whether the prompt data is in langchain format. Default is False.
+
+        Returns:
+            DotDict: The compressed prompt data as `content` and the metric results as `metrics`.
+        """
+        self.check_call_args(skip_system, json, langchain)
+
+        if json or langchain:
+            targets = self.message_targets(prompt_data, skip_system, langchain)
+            comp_texts = await asyncio.gather(
+                *(self.arun(text) for _, texts in targets for text in texts)
+            )
+            comp_prompt_data = self.replace_messages(
+                prompt_data, targets, comp_texts, langchain
+            )
+        else:
+            comp_prompt_data = await self.arun(prompt_data)
+
+        if not self.metrics and not self.verbose:
+            return self.evaluate(prompt_data, comp_prompt_data, skip_system, json, langchain)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.batching.executor,
+            self.evaluate,
+            prompt_data,
+            comp_prompt_data,
+            skip_system,
+            json,
+            langchain,
+        )
+
+    @staticmethod
+    def message_role(data, langchain: bool = False) -> str:
+        """
+        Returns the role of a JSON or langchain chat message.
+        """
+        return data.type if langchain else data["role"]
+
+    @staticmethod
+    def message_content(data, langchain: bool = False):
+        """
+        Returns the content of a JSON or langchain chat message, a string or a list of content parts.
+        """
+        return data.content if langchain else data["content"]
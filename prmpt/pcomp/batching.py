@@ -0,0 +1,99 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+class MicroBatcher:
+    """
+    MicroBatcher collects items submitted concurrently from an asyncio event loop into micro-batches and
+    runs a batch function on them in a background executor, so the event loop is never blocked. A batch
+    is dispatched as soon as it holds `max_batch_size` items or `max_wait_ms` after its first item arrived,
+    whichever comes first. Each caller gets the result of its own item. When the batch function fails,
+    the items are retried one by one, so only the callers whose own item fails get the exception.
+
+    Example:
+        >>> batcher = MicroBatcher(p_compressor.compress_batch, max_batch_size=16, max_wait_ms=5)
+        >>> compressed_prompt = await batcher.submit("example prompt...")
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+    ):
+        """
+        Initializes the MicroBatcher.
+
+        Args:
+            fn (Callable[[List[Any]], List[Any]]): The batch function. It returns one result per item, in order.
+            max_batch_size (int, optional): The maximum number of items per batch. Defaults to `32`.
+            max_wait_ms (float, optional): The maximum time to wait for more items after the first one, in milliseconds. Defaults to `5.0`.
+            executor (Executor, optional): The executor running the batch function. Defaults to `None` i.e. a dedicated single worker thread, so batches grow while the previous one runs.
+        """
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="prmpt-batcher"
+        )
+        self._loop = None
+        self._queue = None
+        self._collector = None
+        self._dispatches = set()
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._collector is None or self._collector.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._collector = loop.create_task(self._collect())
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Adds an item to the next micro-batch and waits for its result.
+
+        Args:
+            item (Any): The item.
+
+        Returns:
+            Any: The result of the batch function for this item.
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = self._loop.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: list) -> None:
+        items = [item for item, _ in batch]
+        try:
+            results = await self._loop.run_in_executor(self.executor, self.fn, items)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            # one bad item must not fail the whole batch: retry the items one by one
+            for item, future in batch:
+                await self._dispatch([(item, future)])
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,541 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Sequence, Union
+
+import numpy as np
+
+class MemoryCache:
+    """
+    MemoryCache is an in-process LRU key-value store bounded by the total size of its values.
+    When a new value does not fit, the least recently used entries are evicted first. With a `ttl`, entries
+    also expire `ttl` seconds after they were stored.
+
+    Example:
+        >>> cache = MemoryCache(max_bytes=2**20)
+        >>> cache.set("key", b"value")
+        >>> cache.get("key")
+        b'value'
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2**20, ttl: Optional[float] = None):
+        """
+        Initializes the MemoryCache.
+
+        Args:
+            max_bytes (int, optional): The maximum total size of the cached values in bytes. Defaults to 64 MiB.
+            ttl (float, optional): The time to live of the entries in seconds. Defaults to `None` i.e. entries do not expire.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the value stored for the key and marks it as most recently used, see `touch_interval`.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[bytes]: The cached value, or `None` if the key is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.time():
+                del self._entries[key]
+                self.nbytes -= len(value)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """
+        Stores the value for the key, evicting least recently used entries to stay within `max_bytes`.
+        Values larger than `max_bytes` are not cached.
+
+        Args:
+            key (str): The cache key.
+            value (bytes): The value to store.
+        """
+        if len(value) > self.max_bytes:
+            return
+
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.nbytes -= len(old_entry[0])
+            while self._entries and self.nbytes + len(value) > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+            self._entries[key] = (value, expires)
+            self.nbytes += len(value)
+
+    def clear(self) -> None:
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCache:
+    """
+    SQLiteCache is an on-disk key-value store backed by a SQLite database, so cached values survive
+    process restarts and can be shared between processes. It is bounded by the total size of its values
+    and evicts the least recently used entries first. The size is summed over the database, not counted
+    in the process, so the bound holds for all the processes sharing it. With a `ttl`, entries also
+    expire `ttl` seconds after they were stored.
+
+    Reads only write the access time of an entry back when it is older than `touch_interval` seconds, so
+    hot entries are not rewritten on every hit; recency is tracked to that resolution.
+
+    Example:
+        >>> cache = SQLiteCache("~/.cache/prmpt/surprisal.sqlite")
+        >>> cache.set("key", b"value")
+        >>> cache.get("key")
+        b'value'
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 2**30,
+        ttl: Optional[float] = None,
+        touch_interval: float = 60.0,
+    ):
+        """
+        Initializes the SQLiteCache.
+
+        Args:
+            path (str): The path of the SQLite database file. Parent directories are created if needed.
+            max_bytes (int, optional): The maximum total size of the cached values in bytes. Defaults to 1 GiB.
+            ttl (float, optional): The time to live of the entries in seconds. Defaults to `None` i.e. entries do not expire.
+            touch_interval (float, optional): The minimum age in seconds of an access time before a read updates it. Defaults to `60.0`.
+        """
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL, "
+            "expires REAL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+        if "expires" not in columns:
+            self._conn.execute("ALTER TABLE entries ADD COLUMN expires REAL")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_size ON entries (size)")
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The total size of the cached values in bytes, over all the processes sharing the database.
+        """
+        with self._lock:
+            return self._total_size()
+
+    def _total_size(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the value stored for the key and marks it as most recently used, see `touch_interval`.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[bytes]: The cached value, or `None` if the key is not cached.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, accessed, expires FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row[2] is not None and row[2] <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.expirations += 1
+                return None
+            if now - row[1] >= self.touch_interval:
+                self._conn.execute(
+                    "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+                )
+            return bytes(row[0])
+
+    def set(self, key: str, value: bytes) -> None:
+        """
+        Stores the value for the key, evicting least recently used entries to stay within `max_bytes`.
+        Values larger than `max_bytes` are not cached.
+
+        Args:
+            key (str): The cache key.
+            value (bytes): The value to store.
+        """
+        if len(value) > self.max_bytes:
+            return
+
+        # one transaction, so processes sharing the database evict against a consistent total size
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed, expires) VALUES (?, ?, ?, ?, ?)",
+                (
+                    key,
+                    sqlite3.Binary(value),
+                    len(value),
+                    now,
+                    now + self.ttl if self.ttl is not None else None,
+                ),
+            )
+
+            nbytes = self._total_size()
+            while nbytes > self.max_bytes:
+                row = self._conn.execute(
+                    "SELECT key, size FROM entries WHERE key != ? ORDER BY accessed LIMIT 1",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+                nbytes -= row[1]
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+class SurprisalCache:
+    """
+    SurprisalCache stores the per-token entropy values computed by `EntropyComp` for a window of tokens,
+    keyed on the model name and a hash of the window token IDs. Repeated windows (system prompts, tool
+    schemas, retrieved documents...) are then served without running the model.
+
+    Lookups go to an in-memory LRU tier first and, if a `path` is given, to an on-disk SQLite tier second.
+    Disk hits are promoted to the memory tier.
+
+    Example:
+        >>> from prmpt.pcomp import EntropyComp, SurprisalCache
+        >>> cache = SurprisalCache(path="~/.cache/prmpt/surprisal.sqlite")
+        >>> p_compressor = EntropyComp(p=0.1, cache=cache)
+        >>> res = p_compressor("example prompt...")
+        >>> cache.stats()
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 2**20,
+        path: Optional[str] = None,
+        disk_max_bytes: int = 2**30,
+    ):
+        """
+        Initializes the SurprisalCache.
+
+        Args:
+            max_bytes (int, optional): The maximum size of the in-memory tier in bytes. Defaults to 64 MiB.
+            path (str, optional): The path of the SQLite database used as on-disk tier. Defaults to `None` i.e. memory only.
+            disk_max_bytes (int, optional): The maximum size of the on-disk tier in bytes. Defaults to 1 GiB.
+        """
+        self.memory = MemoryCache(max_bytes)
+        self.disk = SQLiteCache(path, disk_max_bytes) if path is not None else None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    @staticmethod
+    def key(model_name: str, input_ids: Sequence[int]) -> str:
+        """
+        Computes the cache key of a window.
+
+        Args:
+            model_name (str): The name of the model, including anything else that changes its outputs.
+            input_ids (Sequence[int]): The token IDs of the window.
+
+        Returns:
+            str: The cache key.
+        """
+        digest = hashlib.sha256(model_name.encode("utf-8"))
+        digest.update(np.asarray(input_ids, dtype=np.int64).tobytes())
+        return digest.hexdigest()
+
+    def get(self, model_name: str, input_ids: Sequence[int]) -> Optional[np.ndarray]:
+        """
+        Returns the cached entropy values of a window.
+
+        Args:
+            model_name (str): The name of the model.
+            input_ids (Sequence[int]): The token IDs of the window.
+
+        Returns:
+            Optional[np.ndarray]: The entropy values, or `None` on a cache miss.
+        """
+        key = self.key(model_name, input_ids)
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return np.frombuffer(value, dtype=np.float32)
+
+    def set(self, model_name: str, input_ids: Sequence[int], entropies: np.ndarray) -> None:
+        """
+        Stores the entropy values of a window in all tiers.
+
+        Args:
+            model_name (str): The name of the model.
+            input_ids (Sequence[int]): The token IDs of the window.
+            entropies (np.ndarray): The entropy values of the window tokens.
+        """
+        key = self.key(model_name, input_ids)
+        value = np.asarray(entropies, dtype=np.float32).tobytes()
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The hit and miss counts, the hit rate and the size of each tier.
+        """
+        lookups = self.hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.nbytes,
+            "memory_evictions": self.memory.evictions,
+        }
+        if self.disk is not None:
+            stats.update(
+                {
+                    "disk_hits": self.disk_hits,
+                    "disk_entries": len(self.disk),
+                    "disk_bytes": self.disk.nbytes,
+                    "disk_evictions": self.disk.evictions,
+                }
+            )
+        return stats
+
+    def clear(self) -> None:
+        """
+        Removes all entries from all tiers and resets the counters.
+        """
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        self.hits = self.misses = self.disk_hits = 0
+
+FINGERPRINT_EXCLUDED = (
+    "verbose",
+    "metrics",
+    "protect_tag",
+    "result_cache",
+    "cache",
+    "pool",
+    "memo_size",
+    "memo_path",
+)
+
+def _canonical(value: Any) -> Any:
+    if hasattr(value, "get_config"):
+        return comp_fingerprint(value)
+    if callable(getattr(value, "fingerprint", None)):
+        return value.fingerprint()
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(repr(_canonical(item)) for item in value))
+    if isinstance(value, dict):
+        return tuple(sorted((repr(key), _canonical(item)) for key, item in value.items()))
+    raise TypeError(f"Can't fingerprint a value of type {type(value).__qualname__}")
+
+def comp_fingerprint(comp: Any) -> str:
+    """
+    Computes a stable fingerprint of a prompt compressor configuration: its class and its current
+    `get_config` arguments, so later changes (e.g. of `p`) are taken into account. Arguments that do not
+    change the compressed chunks (verbose flag, metrics, protect tag, caches, execution pool...) are left out.
+
+    The fingerprint is the same in every process, so it can key persistent caches: values must be
+    primitives, containers, compressors or objects with their own content-based `fingerprint()` method
+    (e.g. `LemmaTable`).
+
+    Args:
+        comp (Any): A `PromptComp` or `Sequential`.
+
+    Returns:
+        str: The fingerprint.
+
+    Raises:
+        TypeError: If an argument value can't be fingerprinted.
+    """
+    comp_cls = type(comp)
+    config = {
+        name: _canonical(value)
+        for name, value in comp.get_config().items()
+        if name not in FINGERPRINT_EXCLUDED
+    }
+
+    digest = hashlib.sha256(f"{comp_cls.__module__}.{comp_cls.__qualname__}".encode("utf-8"))
+    digest.update(repr(sorted(config.items())).encode("utf-8"))
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    ResultCache stores compressed texts keyed on the fingerprint of the compressor configuration and a
+    hash of the input text, so a compressor given the same text again returns the stored result without
+    recomputing it. It is used by `PromptComp.run` and `run_batch` on every unprotected chunk.
+
+    The entries are kept in a pluggable backend: a `MemoryCache` (the default) or a `SQLiteCache`, both
+    optionally with a time to live. A cache can be shared by several compressors, e.g. the stages of a
+    `Sequential`, as their fingerprints differ.
+
+    Example:
+        >>> from prmpt.pcomp import LemmatizerComp, ResultCache, SQLiteCache
+        >>> result_cache = ResultCache(SQLiteCache("~/.cache/prmpt/results.sqlite", ttl=86400))
+        >>> p_compressor = LemmatizerComp(result_cache=result_cache)
+        >>> res = p_compressor("example prompt...")
+        >>> result_cache.stats()
+    """
+
+    def __init__(self, backend: Optional[Union[MemoryCache, SQLiteCache]] = None):
+        """
+        Initializes the ResultCache.
+
+        Args:
+            backend (Union[MemoryCache, SQLiteCache], optional): The key-value store of the entries. Defaults to `None` i.e. a 64 MiB `MemoryCache`.
+        """
+        self.backend = backend if backend is not None else MemoryCache()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(fingerprint: str, text: str) -> str:
+        """
+        Computes the cache key of a text.
+
+        Args:
+            fingerprint (str): The compressor fingerprint, see `comp_fingerprint`.
+            text (str): The input text.
+
+        Returns:
+            str: The cache key.
+        """
+        digest = hashlib.sha256(fingerprint.encode("utf-8"))
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def map(
+        self,
+        fingerprint: str,
+        texts: List[str],
+        compress_batch: Callable[[List[str]], List[str]],
+    ) -> List[str]:
+        """
+        Compresses texts through the cache: cached results are reused, and the distinct missing texts are
+        compressed with one `compress_batch` call and stored.
+
+        Args:
+            fingerprint (str): The compressor fingerprint, see `comp_fingerprint`.
+            texts (List[str]): The input texts.
+            compress_batch (Callable[[List[str]], List[str]]): Compresses a list of texts.
+
+        Returns:
+            List[str]: The compressed texts, in order.
+        """
+        keys = [self.key(fingerprint, text) for text in texts]
+        results = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in results or key in missing:
+                continue
+            value = self.backend.get(key)
+            if value is None:
+                missing[key] = text
+            else:
+                results[key] = value.decode("utf-8", "surrogatepass")
+        n_hits = sum(key in results for key in keys)
+        self.hits += n_hits
+        self.misses += len(texts) - n_hits
+
+        if missing:
+            comp_texts = compress_batch(list(missing.values()))
+            for key, comp_text in zip(missing, comp_texts):
+                results[key] = comp_text
+                self.backend.set(key, comp_text.encode("utf-8", "surrogatepass"))
+        return [results[key] for key in keys]
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The hit and miss counts, the hit rate and the backend size.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.backend),
+            "bytes": self.backend.nbytes,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+        }
+
+    def clear(self) -> None:
+        """
+        Removes all entries and resets the counters.
+        """
+        self.backend.clear()
+        self.hits = self.misses = 0
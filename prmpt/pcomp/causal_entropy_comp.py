@@ -0,0 +1,296 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+import torch
+from transformers import AutoModelForCausalLM
+
+from prmpt.pcomp.entropy_comp import EntropyComp
+from prmpt.pcomp.utils import DotDict, content_texts
+from prmpt.runtime import registry
+
+class CausalEntropyComp(EntropyComp):
+    """
+    CausalEntropyComp is the causal language model variant of `EntropyComp`. A causal model (`gpt2` by
+    default, or any local GPT-2-class directory) computes the surprisal of every token given the text to
+    its left, and the tokens corresponding to the lowest `p` percentile surprisals are removed.
+
+    In JSON and langchain chat mode the conversation is scored as one continuous text: each message is
+    scored against all the messages before it. The KV cache of the scored conversation is kept between calls, so when
+    the next request resends the same history plus new turns only the new messages go through the model.
+
+    `CausalEntropyComp` inherits from the EntropyComp class.
+
+    Example:
+        >>> from prmpt.pcomp import CausalEntropyComp
+        >>> p_compressor = CausalEntropyComp(p=0.1)
+        >>> res = p_compressor([{"role": "user", "content": "example prompt..."}], json=True)
+        >>> compressed_messages = res.content
+    """
+
+    def __init__(
+        self,
+        model_name: str = "gpt2",
+        p: float = 0.1,
+        verbose: bool = False,
+        metrics: list = [],
+        max_conversations: int = 8,
+        **kwargs,
+    ):
+        """
+        Initializes the CausalEntropyComp.
+
+        Args:
+            model_name (str, optional): The name or local path of the pretrained causal language model. Defaults to "gpt2".
+            p (float, optional): The percentile cutoff value for selecting tokens. Defaults to `0.1`. Higher `p` means more compression.
+            verbose (bool, optional): Flag indicating whether to enable verbose output. Defaults to False.
+            metrics (list, optional): A list of metric names to evaluate during compression. Defaults to an empty list.
+            max_conversations (int, optional): The number of conversation KV caches kept for reuse. Defaults to `8`.
+            **kwargs: Additional keyword arguments for `EntropyComp`.
+        """
+        super().__init__(model_name, p, verbose, metrics, **kwargs)
+        assert self.backend != "onnx", "CausalEntropyComp needs a torch backend for KV caching"
+        self.max_conversations = max_conversations
+        self.conversations = OrderedDict()
+
+    def get_config(self) -> dict:
+        """
+        Returns the constructor arguments that rebuild the compressor, see `PromptComp.get_config`.
+
+        Returns:
+            dict: The arguments by name.
+        """
+        return {**super().get_config(), "max_conversations": self.max_conversations}
+
+    @property
+    def model(self):
+        """
+        The causal language model, loaded on first use and shared through the model registry.
+        """
+        return registry.get(
+            self.model_name,
+            AutoModelForCausalLM,
+            device=self.device,
+            backend=self.backend,
+            cache_dir=self.backend_cache_dir,
+        )
+
+    @property
+    def bos_token_id(self) -> int:
+        """
+        The token ID fed before the first token so that it is scored with a prediction too.
+        """
+        tokenizer = self.tokenizer
+        if tokenizer.bos_token_id is not None:
+            return tokenizer.bos_token_id
+        return tokenizer.eos_token_id
+
+    def max_window_size(self) -> int:
+        """
+        Returns the largest number of prompt tokens the model can score in one window.
+        One position is reserved for the BOS token.
+
+        Returns:
+            int: The maximum window size.
+        """
+        return super().max_window_size() - 1
+
+    def token_context(self, positions: np.ndarray, start: int, end: int) -> np.ndarray:
+        """
+        Measures how much context the tokens at `positions` have inside the window `[start, end)`.
+        A causal language model only sees the left side.
+
+        Args:
+            positions (np.ndarray): The token positions, all inside the window.
+            start (int): The window start offset.
+            end (int): The window end offset.
+
+        Returns:
+            np.ndarray: The context length of each token.
+        """
+        return positions - start
+
+    def forward_entropies(
+        self, input_ids: torch.Tensor, attention_mask: torch.Tensor
+    ) -> np.ndarray:
+        """
+        Runs the model on a padded batch and returns the entropy value of every position.
+        A BOS token is prepended, so the logits at each position predict the next token.
+
+        Args:
+            input_ids (torch.Tensor): The padded token IDs of shape `(batch, seq)`.
+            attention_mask (torch.Tensor): The attention mask of shape `(batch, seq)`.
+
+        Returns:
+            np.ndarray: The entropy values of shape `(batch, seq)`.
+        """
+        bos = torch.full_like(input_ids[:, :1], self.bos_token_id)
+        with torch.inference_mode(), self.autocast():
+            outputs = self.model(
+                torch.cat([bos, input_ids], dim=1),
+                attention_mask=torch.cat([torch.ones_like(bos), attention_mask], dim=1),
+            )
+            return self.surprisals(outputs.logits[:, :-1], input_ids).cpu().numpy()
+
+    def prime(self, token_ids: List[int]) -> DotDict:
+        """
+        Builds a fresh conversation state by running the model over the last tokens of a conversation.
+
+        Args:
+            token_ids (List[int]): The conversation token IDs. Only the last half context is used.
+
+        Returns:
+            DotDict: The conversation state.
+        """
+        token_ids = token_ids[-(self.max_window_size() // 2) :]
+        input_ids = torch.tensor(
+            [[self.bos_token_id] + token_ids], dtype=torch.long, device=self.device
+        )
+        with torch.inference_mode(), self.autocast():
+            outputs = self.model(input_ids, use_cache=True)
+
+        state = DotDict()
+        state.past_key_values = outputs.past_key_values
+        state.next_logits = outputs.logits[0, -1:].float()
+        state.token_ids = token_ids
+        state.message_entropies = []
+        return state
+
+    def advance(self, state: DotDict, token_ids: List[int]) -> np.ndarray:
+        """
+        Scores new tokens against the conversation state and appends them to it.
+
+        When the tokens do not fit in the model context next to the cached ones, the state is rebuilt from
+        the tail of the conversation first. Messages too long for that are scored on their own with
+        overlapping windows.
+
+        Args:
+            state (DotDict): The conversation state, updated in place.
+            token_ids (List[int]): The new token IDs.
+
+        Returns:
+            np.ndarray: The entropy value of each new token.
+        """
+        if not len(token_ids):
+            return np.zeros(0, dtype=np.float32)
+
+        max_positions = self.max_window_size()
+        if len(token_ids) > max_positions // 2:
+            (_, entropies), = self.score_sequences([token_ids])
+            message_entropies = state.message_entropies
+            state.update(self.prime(state.token_ids + token_ids))
+            state.message_entropies = message_entropies
+            return entropies
+        if len(state.token_ids) + len(token_ids) > max_positions:
+            message_entropies = state.message_entropies
+            state.update(self.prime(state.token_ids))
+            state.message_entropies = message_entropies
+
+        input_ids = torch.tensor([token_ids], dtype=torch.long, device=self.device)
+        with torch.inference_mode(), self.autocast():
+            outputs = self.model(
+                input_ids, past_key_values=state.past_key_values, use_cache=True
+            )
+            logits = torch.cat([state.next_logits, outputs.logits[0, :-1].float()])
+            entropies = self.surprisals(logits[None], input_ids).cpu().numpy()[0]
+
+        state.past_key_values = outputs.past_key_values
+        state.next_logits = outputs.logits[0, -1:].float()
+        state.token_ids = (state.token_ids + token_ids)[-max_positions:]
+        return entropies
+
+    def run_messages(
+        self, messages: list, skip_system: bool = False, langchain: bool = False
+    ) -> list:
+        """
+        Applies prompt compression to a JSON or langchain chat conversation, reusing the KV cache of the
+        longest conversation prefix scored by an earlier call. Only the messages whose content changes are
+        copied, and the text parts of list content are compressed one by one.
+
+        Args:
+            messages (list): The chat messages.
+            skip_system (bool, optional): Whether to leave system messages uncompressed. They are still used as context. Defaults to False.
+            langchain (bool, optional): Whether the messages are langchain messages. Defaults to False.
+
+        Returns:
+            list: The messages, the changed ones replaced by copies with the compressed content.
+        """
+        roles = [self.message_role(data, langchain) for data in messages]
+        message_texts = [content_texts(self.message_content(data, langchain)) for data in messages]
+
+        digests = []
+        digest = hashlib.sha256()
+        for role, texts in zip(roles, message_texts):
+            content = "\1".join(texts)
+            digest.update(f"{role}\0{content}\0".encode("utf-8"))
+            digests.append(digest.hexdigest())
+
+        n_cached, state = 0, None
+        for i in range(len(digests), 0, -1):
+            if digests[i - 1] in self.conversations:
+                n_cached, state = i, self.conversations.pop(digests[i - 1])
+                break
+        if state is None:
+            state = self.prime([])
+        state.message_entropies = state.message_entropies[:n_cached]
+
+        targets, comp_texts = [], []
+        for i, (role, texts) in enumerate(zip(roles, message_texts)):
+            parts = [self.message_segments(text) for text in texts]
+            part_ids = [
+                [self.tokenizer.encode(text, add_special_tokens=False) for text, _ in segments]
+                for segments in parts
+            ]
+            if i >= n_cached:
+                header = f"{role}:\n" if i == 0 else f"\n\n{role}:\n"
+                self.advance(state, self.tokenizer.encode(header, add_special_tokens=False))
+                state.message_entropies.append(
+                    self.advance(
+                        state, [t for segment_ids in part_ids for ids in segment_ids for t in ids]
+                    )
+                )
+            if skip_system and role == "system":
+                continue
+
+            targets.append((i, texts))
+            offset = 0
+            for text, segments, segment_ids in zip(texts, parts, part_ids):
+                n_tokens = sum(len(ids) for ids in segment_ids)
+                entropies = state.message_entropies[i][offset : offset + n_tokens]
+                comp_texts.append(self.compress_message(text, segments, segment_ids, entropies))
+                offset += n_tokens
+
+        if digests:
+            self.conversations[digests[-1]] = state
+            while len(self.conversations) > self.max_conversations:
+                self.conversations.popitem(last=False)
+        return self.replace_messages(messages, targets, comp_texts, langchain)
+
+    async def acall(
+        self,
+        prompt_data: list,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> DotDict:
+        """
+        Asynchronous `__call__`. JSON and langchain chats are compressed whole in the background batching
+        thread so the conversation KV caches are reused; other formats are micro-batched like in `PromptComp.acall`.
+
+        Args:
+            prompt_data: A list of prompt data.
+            skip_system: A boolean indicating whether to skip system prompts. Default is False.
+            json: A boolean indicating whether the prompt data is in JSON format. Default is False.
+            langchain: A boolean indicating whether the prompt data is in langchain format. Default is False.
+
+        Returns:
+            DotDict: The compressed prompt data as `content` and the metric results as `metrics`.
+        """
+        if not (json or langchain):
+            return await super().acall(prompt_data, skip_system, json, langchain)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.batcher("run_batch").executor,
+            lambda: self(prompt_data, skip_system=skip_system, json=json, langchain=langchain),
+        )
@@ -0,0 +1,173 @@
+import hashlib
+import json
+from typing import Any, List, Tuple
+
+from .base import PromptComp
+from .utils import DotDict
+
+class ConversationCompressor:
+    """
+    ConversationCompressor compresses a chat incrementally, turn after turn. It remembers the compressed
+    form of every message it has seen, by position and content hash, and only compresses the messages
+    appended since the previous turn, with one `run_messages` call. The compressed prefix is returned
+    unchanged, byte for byte, so provider-side prefix caches keep hitting.
+
+    When an earlier message differs from the remembered one (e.g. the history was edited or truncated),
+    that message and all the following ones are compressed again.
+
+    Example:
+        >>> from prmpt.pcomp import ConversationCompressor, LemmatizerComp
+        >>> conversation = ConversationCompressor(LemmatizerComp(), skip_system=True)
+        >>> messages = [{"role": "system", "content": "..."}, {"role": "user", "content": "example prompt..."}]
+        >>> res = conversation(messages)
+        >>> messages += [{"role": "assistant", "content": "..."}, {"role": "user", "content": "..."}]
+        >>> res = conversation(messages)  # only the two new messages are compressed
+    """
+
+    def __init__(
+        self, comp: PromptComp, skip_system: bool = False, langchain: bool = False
+    ):
+        """
+        Initializes the ConversationCompressor.
+
+        Args:
+            comp (PromptComp): The prompt compressor applied to the messages.
+            skip_system (bool, optional): Whether to skip messages with role 'system'. Defaults to False.
+            langchain (bool, optional): Whether the messages are langchain messages instead of JSON ones. Defaults to False.
+        """
+        self.comp = comp
+        self.skip_system = skip_system
+        self.langchain = langchain
+        self.entries: List[Tuple[str, Any]] = []
+        self.evaluations: List[Tuple[int, int, list]] = []
+        self.last_reused = 0
+        self.reused = 0
+        self.compressed = 0
+
+    def message_digest(self, data: Any) -> str:
+        """
+        Hashes a chat message, all of its fields included.
+
+        Args:
+            data (Any): The JSON or langchain chat message.
+
+        Returns:
+            str: The digest.
+        """
+        if self.langchain:
+            text = repr(data)
+        else:
+            text = json.dumps(data, sort_keys=True, ensure_ascii=False, default=repr)
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def compress(self, messages: list) -> list:
+        """
+        Compresses the chat, reusing the compressed messages remembered from the previous turns.
+
+        Args:
+            messages (list): The whole chat history.
+
+        Returns:
+            list: The compressed chat messages.
+        """
+        digests = [self.message_digest(data) for data in messages]
+
+        n_reused = 0
+        for (digest, _), new_digest in zip(self.entries, digests):
+            if digest != new_digest:
+                break
+            n_reused += 1
+        del self.entries[n_reused:]
+
+        new_messages = self.comp.run_messages(
+            messages[n_reused:], self.skip_system, self.langchain
+        )
+        self.entries.extend(zip(digests[n_reused:], new_messages))
+        self.last_reused = n_reused
+        self.reused += n_reused
+        self.compressed += len(new_messages)
+
+        return [comp_data for _, comp_data in self.entries]
+
+    def __call__(self, messages: list) -> DotDict:
+        """
+        Compresses the chat and evaluates the metrics of the compressor on it. Like the compression, the
+        evaluation is incremental: the metrics are only computed on the messages compressed by this turn,
+        and the results of all the turns are averaged over their messages.
+
+        Args:
+            messages (list): The whole chat history.
+
+        Returns:
+            DotDict: The compressed messages as `content` and the metric results as `metrics`.
+        """
+        comp_messages = self.compress(messages)
+
+        # results covering reused messages only are kept; the others are computed again
+        start = self.last_reused
+        while self.evaluations and self.evaluations[-1][1] > self.last_reused:
+            start = self.evaluations.pop()[0]
+        if start < len(messages) and self.comp.metrics:
+            self.evaluations.append((start, len(messages), self.evaluate(
+                messages[start:], comp_messages[start:]
+            )))
+
+        result = DotDict()
+        result.content = comp_messages
+        result.metrics = [
+            self.average([results[i] for _, _, results in self.evaluations])
+            for i in range(len(self.comp.metrics))
+        ]
+        return result
+
+    def evaluate(self, messages: list, comp_messages: list) -> List[Tuple[dict, int]]:
+        """
+        Computes the metrics of the compressor on some messages.
+
+        Args:
+            messages (list): The original messages.
+            comp_messages (list): The compressed messages.
+
+        Returns:
+            List[Tuple[dict, int]]: For each metric, its average results and the number of messages they cover.
+        """
+        is_json = not self.langchain
+        results = []
+        for metric in self.comp.metrics:
+            n_messages = len(
+                metric.text_pairs(messages, comp_messages, self.skip_system, is_json, self.langchain)
+            )
+            metric_result = metric.batch_run(
+                messages, comp_messages, self.skip_system, is_json, self.langchain
+            )
+            results.append((dict(metric_result), n_messages))
+        return results
+
+    @staticmethod
+    def average(results: List[Tuple[dict, int]]) -> dict:
+        """
+        Averages metric results weighted by the number of messages they cover.
+
+        Args:
+            results (List[Tuple[dict, int]]): The average results and message counts of each turn.
+
+        Returns:
+            dict: The average results over all the messages.
+        """
+        n_messages = sum(n for _, n in results)
+        totals = {}
+        for metric_result, n in results:
+            for key, value in metric_result.items():
+                totals[key] = totals.get(key, 0.0) + value * n
+        return {key: total / n_messages for key, total in totals.items()} if n_messages else {}
+
+    def reset(self) -> None:
+        """
+        Forgets the remembered messages and resets the counters.
+        """
+        self.entries = []
+        self.evaluations = []
+        self.last_reused = self.reused = self.compressed = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -1,8 +1,15 @@
+import math
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
 import numpy as np
+import tiktoken
 import torch
-from transformers import AutoModelForMaskedLM, AutoTokenizer
+from transformers import AutoModelForMaskedLM
 
 from prmpt.pcomp.base import PromptComp
+from prmpt.pcomp.cache import SurprisalCache
+from prmpt.pcomp.utils import protect_spans
+from prmpt.runtime import ExecutionPool, registry
 
 class EntropyComp(PromptComp):
     """
@@ -30,6 +37,18 @@ class EntropyComp(PromptComp):
         p: float = 0.1,
         verbose: bool = False,
         metrics: list = [],
+        batch_size: int = 16,
+        compute_dtype: Optional[str] = None,
+        window_size: Optional[int] = None,
+        stride: Optional[int] = None,
+        cache: Optional[SurprisalCache] = None,
+        backend: str = "torch",
+        backend_cache_dir: Optional[str] = None,
+        target_tokens: Optional[int] = None,
+        target_ratio: Optional[float] = None,
+        budget_tokenizer: str = "cl100k_base",
+        pool: Optional[ExecutionPool] = None,
+        protect_context: bool = False,
         **kwargs,
     ):
         """
@@ -40,61 +59,304 @@ class EntropyComp(PromptComp):
             p (float, optional): The percentile cutoff value for selecting tokens. Defaults to `0.1`. Higher `p` means more compression.
             verbose (bool, optional): Flag indicating whether to enable verbose output. Defaults to False.
             metrics (list, optional): A list of metric names to evaluate during compression. Defaults to an empty list.
+            batch_size (int, optional): The maximum number of windows scored in one forward pass. Defaults to `16`.
+            compute_dtype (str, optional): Reduced precision (`"bfloat16"` or `"float16"`) to run the model in through autocast. Defaults to `None` i.e. full precision.
+            window_size (int, optional): The number of tokenizer tokens per scoring window. Defaults to `None` i.e. the model context length.
+            stride (int, optional): The number of tokens between the starts of consecutive windows. Defaults to `None` i.e. 3/4 of `window_size`.
+            cache (SurprisalCache, optional): Cache of window entropy values shared across calls. Defaults to `None` i.e. no caching.
+            backend (str, optional): The inference backend, one of `"torch"`, `"torch-int8"` or `"onnx"`. Defaults to `"torch"`.
+            backend_cache_dir (str, optional): The directory of the converted `"torch-int8"`/`"onnx"` models. Defaults to `~/.cache/prmpt/backends`.
+            target_tokens (int, optional): Keep the most surprising tokens that fit in this many `budget_tokenizer` tokens, instead of using `p`. The budget covers the whole prompt, protected content included, so protected prompts are scored whole. Defaults to `None`.
+            target_ratio (float, optional): Remove this fraction of the `budget_tokenizer` tokens (the `TokenMetric` compression ratio), instead of using `p`. Defaults to `None`.
+            budget_tokenizer (str, optional): The `tiktoken` encoding used to measure `target_tokens` and `target_ratio`. Defaults to "cl100k_base".
+            pool (ExecutionPool, optional): Pool of model replicas the batches are dispatched to. Defaults to `None` i.e. batches run one after another in the calling thread.
+            protect_context (bool, optional): With a `protect_tag`, score each prompt whole so protected spans stay context for the tokens around them; only unprotected tokens can be removed. Defaults to False i.e. unprotected chunks are scored on their own.
         """
+        assert (
+            target_tokens is None or target_ratio is None
+        ), "Only one of `target_tokens` and `target_ratio` can be set"
         super().__init__(verbose, metrics, **kwargs)
         self.p = p * 100
         self.model_name = model_name
-        self.load_mlm_model_tokenizer()
+        self.batch_size = batch_size
+        self.compute_dtype = (
+            getattr(torch, compute_dtype) if compute_dtype is not None else None
+        )
+        self.window_size = window_size
+        self.stride = stride
+        self.cache = cache
+        self.backend = backend
+        self.backend_cache_dir = backend_cache_dir
+        self.target_tokens = target_tokens
+        self.target_ratio = target_ratio
+        self.budget_tokenizer = budget_tokenizer
+        self.pool = pool
+        self.protect_context = protect_context
+        self.device = torch.device(
+            "cuda" if torch.cuda.is_available() and backend == "torch" else "cpu"
+        )
 
-    def load_mlm_model_tokenizer(self):
+    def get_config(self) -> dict:
         """
-        Loads the masked language model and tokenizer.
+        Returns the constructor arguments that rebuild the compressor, see `PromptComp.get_config`.
+
+        Returns:
+            dict: The arguments by name.
         """
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModelForMaskedLM.from_pretrained(self.model_name)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
+        return {
+            **super().get_config(),
+            "model_name": self.model_name,
+            "p": self.p / 100,
+            "batch_size": self.batch_size,
+            "compute_dtype": (
+                str(self.compute_dtype).replace("torch.", "")
+                if self.compute_dtype is not None
+                else None
+            ),
+            "window_size": self.window_size,
+            "stride": self.stride,
+            "cache": self.cache,
+            "backend": self.backend,
+            "backend_cache_dir": self.backend_cache_dir,
+            "target_tokens": self.target_tokens,
+            "target_ratio": self.target_ratio,
+            "budget_tokenizer": self.budget_tokenizer,
+            "pool": self.pool,
+            "protect_context": self.protect_context,
+        }
 
-    def generate_confidence_values(self, sentence: str) -> list:
+    @property
+    def model(self):
         """
-        Generates entropy values for each token in the sentence.
+        The masked language model, loaded on first use and shared through the model registry.
+        """
+        return registry.get(
+            self.model_name,
+            AutoModelForMaskedLM,
+            device=self.device,
+            backend=self.backend,
+            cache_dir=self.backend_cache_dir,
+        )
+
+    @property
+    def tokenizer(self):
+        """
+        The tokenizer of the masked language model, loaded on first use and shared through the model registry.
+        """
+        return registry.get_tokenizer(self.model_name)
+
+    def load_mlm_model_tokenizer(self) -> tuple:
+        """
+        Loads the masked language model and tokenizer ahead of the first compression.
+
+        Returns:
+            tuple: The model and the tokenizer.
+        """
+        return self.model, self.tokenizer
+
+    def surprisals(self, logits: torch.Tensor, input_ids: torch.Tensor) -> torch.Tensor:
+        """
+        Computes the surprisal (in bits) of the observed tokens from the model logits.
+
+        Only the logit of the observed token is gathered and normalized with a log-sum-exp over the
+        vocabulary, so the full softmax distribution is never materialized.
 
         Args:
-            sentence (str): The input sentence.
+            logits (torch.Tensor): The model logits of shape `(batch, seq, vocab)`.
+            input_ids (torch.Tensor): The observed token IDs of shape `(batch, seq)`.
 
         Returns:
-            list: A list of tuples containing token IDs and their corresponding entropy values.
+            torch.Tensor: The surprisal values of shape `(batch, seq)`.
+        """
+        logits = logits.float()
+        observed = logits.gather(-1, input_ids.unsqueeze(-1)).squeeze(-1)
+        return (torch.logsumexp(logits, dim=-1) - observed) / math.log(2)
+
+    def autocast(self):
         """
-        inputs = self.tokenizer.encode_plus(
-            sentence, return_tensors="pt", add_special_tokens=False
+        Returns the autocast context used to run the model in `compute_dtype`.
+        """
+        return torch.autocast(
+            device_type=self.device.type,
+            dtype=self.compute_dtype,
+            enabled=self.compute_dtype is not None,
         )
-        input_ids = inputs["input_ids"].to(self.device)
-        attention_mask = inputs["attention_mask"].to(self.device)
 
-        with torch.no_grad():
+    def forward_entropies(
+        self, input_ids: torch.Tensor, attention_mask: torch.Tensor
+    ) -> np.ndarray:
+        """
+        Runs the model on a padded batch and returns the entropy value of every position.
+
+        Args:
+            input_ids (torch.Tensor): The padded token IDs of shape `(batch, seq)`.
+            attention_mask (torch.Tensor): The attention mask of shape `(batch, seq)`.
+
+        Returns:
+            np.ndarray: The entropy values of shape `(batch, seq)`.
+        """
+        with torch.inference_mode(), self.autocast():
             outputs = self.model(input_ids, attention_mask=attention_mask)
-            logits = outputs.logits[0]
+            return self.surprisals(outputs.logits, input_ids).cpu().numpy()
+
+    def score_batch(
+        self, batch_input_ids: List[List[int]]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Generates entropy values for several token sequences, scoring them in padded batches.
+
+        Sequences are sorted by length and grouped into batches of at most `batch_size`, so each batch
+        is padded to the length of its longest member only. Padded positions are masked out and never
+        reported. Sequences found in `cache` skip the forward pass.
+
+        Args:
+            batch_input_ids (List[List[int]]): The token IDs of each sequence, without special tokens.
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray]]: For each input sequence, its token IDs and their corresponding entropy values.
+        """
+        entropy_mappings = [
+            (np.asarray(ids, dtype=np.int64), np.zeros(len(ids), dtype=np.float32))
+            for ids in batch_input_ids
+        ]
+        cache_key = f"{type(self).__name__}:{self.model_name}:{self.backend}:{self.compute_dtype}"
+        pending = []
+        for i, ids in enumerate(batch_input_ids):
+            if not len(ids):
+                continue
+            cached = self.cache.get(cache_key, ids) if self.cache is not None else None
+            if cached is not None:
+                entropy_mappings[i][1][:] = cached
+            else:
+                pending.append(i)
 
-        probs = torch.softmax(logits, dim=-1)
-        entropy_mapping = []
-        for i, input_id in enumerate(input_ids[0].detach().cpu().numpy()):
-            entropy = -torch.log2(probs[i, input_id]).detach().cpu().item()
-            entropy_mapping.append((input_id, entropy))
-        return entropy_mapping
+        order = sorted(pending, key=lambda i: len(batch_input_ids[i]), reverse=True)
+        pad_token_id = self.tokenizer.pad_token_id or 0
+
+        batches = []
+        for b_start in range(0, len(order), self.batch_size):
+            b_idxs = order[b_start : b_start + self.batch_size]
+            max_len = len(batch_input_ids[b_idxs[0]])
+            input_ids = torch.full((len(b_idxs), max_len), pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(b_idxs), max_len), dtype=torch.long)
+            for row, idx in enumerate(b_idxs):
+                ids = batch_input_ids[idx]
+                input_ids[row, : len(ids)] = torch.tensor(ids, dtype=torch.long)
+                attention_mask[row, : len(ids)] = 1
+            batches.append((input_ids.to(self.device), attention_mask.to(self.device)))
+
+        if self.pool is not None:
+            batch_entropies = self.pool.map(lambda batch: self.forward_entropies(*batch), batches)
+        else:
+            batch_entropies = [self.forward_entropies(*batch) for batch in batches]
+
+        for b_start, entropies in zip(range(0, len(order), self.batch_size), batch_entropies):
+            for row, idx in enumerate(order[b_start : b_start + self.batch_size]):
+                entropy_mappings[idx][1][:] = entropies[row, : len(batch_input_ids[idx])]
+                if self.cache is not None:
+                    self.cache.set(cache_key, batch_input_ids[idx], entropy_mappings[idx][1])
+
+        return entropy_mappings
+
+    def generate_confidence_values(self, sentence: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Generates entropy values for each token in the sentence.
+
+        Args:
+            sentence (str): The input sentence.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The token IDs and their corresponding entropy values.
+        """
+        input_ids = self.tokenizer.encode(sentence, add_special_tokens=False)
+        return self.score_batch([input_ids])[0]
 
-    def percentile_cutoff_tokens(self, entropy_mapping: list) -> list:
+    def percentile_cutoff_tokens(
+        self, entropy_mapping: Tuple[np.ndarray, np.ndarray]
+    ) -> list:
         """
         Selects tokens with entropy values above a percentile cutoff.
 
         Args:
-            entropy_mapping (list): A list of tuples containing token IDs and their corresponding entropy values.
+            entropy_mapping (Tuple[np.ndarray, np.ndarray]): The token IDs and their corresponding entropy values.
 
         Returns:
             list: A list of selected token IDs.
         """
-        surprise_cutoff = np.percentile([cm[1] for cm in entropy_mapping], self.p)
-        filtered_tokens = [cm[0] for cm in entropy_mapping if cm[1] >= surprise_cutoff]
+        token_ids, entropies = entropy_mapping
+        surprise_cutoff = np.percentile(entropies, self.p)
+        filtered_tokens = token_ids[entropies >= surprise_cutoff].tolist()
         return filtered_tokens
+
+    def count_budget_tokens(self, text: str) -> int:
+        """
+        Counts the tokens of a text with the `budget_tokenizer` encoding.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            int: The number of tokens.
+        """
+        return len(tiktoken.get_encoding(self.budget_tokenizer).encode_ordinary(text))
+
+    def keep_mask(
+        self,
+        entropies: np.ndarray,
+        render: Callable[[np.ndarray], str],
+        original: str,
+        removable: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Selects the tokens to keep from their entropy values.
+
+        Without a budget, the removable tokens below the `p` percentile entropy are dropped. With
+        `target_tokens` or `target_ratio`, removable tokens are kept in decreasing entropy order and the
+        number kept is found by bisection on the `budget_tokenizer` length of the rendered text. Only the
+        text is re-rendered during the search; the entropy values are computed once. A `target_ratio`
+        budget is a fraction of the tokens of the original text, as counted by `TokenMetric`, not of the
+        decoded tokens, which re-spaces punctuation and may change case.
+
+        Args:
+            entropies (np.ndarray): The entropy value of each token.
+            render (Callable[[np.ndarray], str]): Builds the compressed text from a boolean keep mask.
+            original (str): The original text, whose `budget_tokenizer` length `target_ratio` applies to.
+            removable (np.ndarray, optional): Boolean mask of the tokens that may be removed. Defaults to `None` i.e. all tokens.
+
+        Returns:
+            np.ndarray: Boolean mask of the tokens to keep.
+        """
+        if removable is None:
+            removable = np.ones(len(entropies), dtype=bool)
+        if not removable.any():
+            return np.ones(len(entropies), dtype=bool)
+
+        if self.target_tokens is None and self.target_ratio is None:
+            surprise_cutoff = np.percentile(entropies[removable], self.p)
+            return ~removable | (entropies >= surprise_cutoff)
+
+        if self.target_tokens is not None:
+            budget = self.target_tokens
+        else:
+            n_tokens = self.count_budget_tokens(original)
+            budget = math.floor((1 - self.target_ratio) * n_tokens)
+
+        candidates = np.flatnonzero(removable)
+        candidates = candidates[np.argsort(-entropies[candidates], kind="stable")]
+
+        def keep_top(k: int) -> np.ndarray:
+            keep = ~removable
+            keep[candidates[:k]] = True
+            return keep
+
+        low, high = 0, len(candidates)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.count_budget_tokens(render(keep_top(mid))) <= budget:
+                low = mid
+            else:
+                high = mid - 1
+        return keep_top(low)
     
     def run_chunk(self, prompt: str) -> str:
         """
@@ -111,6 +373,137 @@ class EntropyComp(PromptComp):
         compressed_prompt = self.tokenizer.decode(filtered_tokens)
         return compressed_prompt
     
+    def max_window_size(self) -> int:
+        """
+        Returns the largest number of prompt tokens the model can score in one window.
+
+        Returns:
+            int: The maximum window size.
+        """
+        return min(
+            self.model.config.max_position_embeddings, self.tokenizer.model_max_length
+        )
+
+    def token_context(self, positions: np.ndarray, start: int, end: int) -> np.ndarray:
+        """
+        Measures how much context the tokens at `positions` have inside the window `[start, end)`.
+        A masked language model sees both sides, so this is the smaller of the left and right context.
+
+        Args:
+            positions (np.ndarray): The token positions, all inside the window.
+            start (int): The window start offset.
+            end (int): The window end offset.
+
+        Returns:
+            np.ndarray: The context length of each token.
+        """
+        return np.minimum(positions - start, end - 1 - positions)
+
+    def token_windows(self, n_tokens: int) -> List[Tuple[int, int]]:
+        """
+        Computes the overlapping windows used to score a sequence of tokens.
+
+        Windows hold at most `window_size` tokenizer tokens and start every `stride` tokens. The last
+        window is aligned to the end of the sequence, so every window is full length.
+
+        Args:
+            n_tokens (int): The number of tokens in the sequence.
+
+        Returns:
+            List[Tuple[int, int]]: The `(start, end)` token offsets of each window.
+        """
+        window_size = self.window_size or self.max_window_size()
+        stride = min(self.stride or max(1, window_size * 3 // 4), window_size)
+        if n_tokens <= window_size:
+            return [(0, n_tokens)]
+
+        starts = list(range(0, n_tokens - window_size, stride))
+        starts.append(n_tokens - window_size)
+        return [(start, start + window_size) for start in starts]
+
+    def merge_window_entropies(
+        self,
+        n_tokens: int,
+        windows: List[Tuple[int, int]],
+        window_entropies: List[np.ndarray],
+    ) -> np.ndarray:
+        """
+        Merges the entropy values of overlapping windows into one value per token.
+
+        Each token takes its value from the window in which it has the most context, as measured by
+        `token_context`.
+
+        Args:
+            n_tokens (int): The number of tokens in the sequence.
+            windows (List[Tuple[int, int]]): The `(start, end)` token offsets of each window.
+            window_entropies (List[np.ndarray]): The entropy values computed for each window.
+
+        Returns:
+            np.ndarray: The entropy value of each token.
+        """
+        entropies = np.zeros(n_tokens, dtype=np.float32)
+        best_context = np.full(n_tokens, -1)
+        positions = np.arange(n_tokens)
+        for (start, end), window_entropy in zip(windows, window_entropies):
+            context = self.token_context(positions[start:end], start, end)
+            better = context > best_context[start:end]
+            entropies[start:end][better] = window_entropy[better]
+            best_context[start:end][better] = context[better]
+        return entropies
+
+    def score_sequences(
+        self, batch_input_ids: List[List[int]]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Generates entropy values for token sequences of any length.
+
+        Sequences are split into overlapping token windows. The windows of all sequences are scored
+        together in padded, length-bucketed batches and merged back per sequence.
+
+        Args:
+            batch_input_ids (List[List[int]]): The token IDs of each sequence, without special tokens.
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray]]: For each sequence, its token IDs and their corresponding entropy values.
+        """
+        batch_input_ids = [np.asarray(ids, dtype=np.int64) for ids in batch_input_ids]
+        batch_windows = [self.token_windows(len(ids)) for ids in batch_input_ids]
+        window_mappings = iter(
+            self.score_batch(
+                [
+                    ids[start:end].tolist()
+                    for ids, windows in zip(batch_input_ids, batch_windows)
+                    for start, end in windows
+                ]
+            )
+        )
+
+        entropy_mappings = []
+        for ids, windows in zip(batch_input_ids, batch_windows):
+            window_entropies = [next(window_mappings)[1] for _ in windows]
+            entropies = self.merge_window_entropies(len(ids), windows, window_entropies)
+            entropy_mappings.append((ids, entropies))
+        return entropy_mappings
+
+    def score_prompts(self, prompts: List[str]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Generates entropy values for every token of several prompts.
+
+        Prompts are tokenized once and scored with `score_sequences`.
+
+        Args:
+            prompts (List[str]): The prompt texts.
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray]]: For each prompt, its token IDs and their corresponding entropy values.
+        """
+        return self.score_sequences(
+            [
+                self.tokenizer.encode(prompt, add_special_tokens=False, verbose=False)
+                for prompt in prompts
+            ]
+        )
+
     def compress(self, prompt: str) -> str:
         """
         Runs the prompt compression technique on the prompt.
@@ -120,11 +513,201 @@ class EntropyComp(PromptComp):
         Returns:
             str: The compressed prompt text.
         """
-        max_l = int(0.7 * self.model.config.max_position_embeddings)
-        tokens = prompt.split()
-        comp_prompt = ""
-        for idx in range(0, len(tokens), max_l):
-            part_prompt = " ".join(tokens[idx : idx + max_l])
-            part_comp_prompt = self.run_chunk(part_prompt)
-            comp_prompt += part_comp_prompt
-        return comp_prompt
+        return self.compress_batch([prompt])[0]
+
+    def compress_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Runs the prompt compression technique on several prompts at once.
+
+        The windows of all prompts are scored together in padded, length-bucketed batches, which
+        needs far fewer forward passes than compressing the prompts one by one.
+
+        Args:
+            prompts (List[str]): The prompt texts.
+
+        Returns:
+            List[str]: The compressed prompt texts, in the same order as `prompts`.
+        """
+        comp_prompts = []
+        for prompt, (token_ids, entropies) in zip(prompts, self.score_prompts(prompts)):
+
+            def render(keep: np.ndarray, token_ids: np.ndarray = token_ids) -> str:
+                return self.tokenizer.decode(token_ids[keep].tolist())
+
+            comp_prompts.append(render(self.keep_mask(entropies, render, prompt)))
+        return comp_prompts
+
+    def compress_stream(
+        self, chunks: Iterable[str], segment_chars: int = 16384, context_chars: int = 1024
+    ) -> Iterator[str]:
+        """
+        Compresses text arriving in chunks, see `PromptComp.compress_stream`. A `target_tokens` budget
+        needs the whole prompt, so it can't be used when streaming; `target_ratio` can.
+
+        Args:
+            chunks (Iterable[str]): The text chunks.
+            segment_chars (int, optional): The segment size in characters. Defaults to `16384`.
+            context_chars (int, optional): The context size in characters on each side of a segment. Defaults to `1024`.
+
+        Returns:
+            Iterator[str]: The compressed text pieces, in order.
+        """
+        assert (
+            self.target_tokens is None
+        ), "`target_tokens` applies to a whole prompt and can't be used when streaming, use `target_ratio`"
+        return super().compress_stream(chunks, segment_chars, context_chars)
+
+    def compress_segment(
+        self, segment: str, left_context: str = "", right_context: str = ""
+    ) -> str:
+        """
+        Compresses one segment of a streamed text. The segment is scored together with the text around it,
+        so the tokens near the segment edges keep their context; only segment tokens can be removed.
+
+        Args:
+            segment (str): The segment text.
+            left_context (str, optional): The original text right before the segment. Defaults to "".
+            right_context (str, optional): The original text right after the segment. Defaults to "".
+
+        Returns:
+            str: The compressed segment text.
+        """
+        if not left_context and not right_context:
+            return self.compress(segment)
+
+        left_ids, token_ids, right_ids = (
+            self.tokenizer.encode(text, add_special_tokens=False)
+            for text in (left_context, segment, right_context)
+        )
+        (_, entropies), = self.score_sequences([left_ids + token_ids + right_ids])
+        entropies = entropies[len(left_ids) : len(left_ids) + len(token_ids)]
+        token_ids = np.array(token_ids, dtype=np.int64)
+
+        def render(keep: np.ndarray) -> str:
+            return self.tokenizer.decode(token_ids[keep].tolist())
+
+        return render(self.keep_mask(entropies, render, segment))
+
+    def message_segments(self, content: str) -> List[Tuple[str, bool]]:
+        """
+        Splits message content into text segments, flagging the protected ones.
+
+        Args:
+            content (str): The message content.
+
+        Returns:
+            List[Tuple[str, bool]]: The segments in order, with `True` for protected segments.
+        """
+        if self.protect_tag is None:
+            return [(content, False)]
+
+        return [
+            (content[start:end], kind is not None)
+            for start, end, kind in protect_spans(content, self.protect_tag)
+        ]
+
+    def compress_message(
+        self,
+        content: str,
+        segments: List[Tuple[str, bool]],
+        segment_ids: List[List[int]],
+        entropies: np.ndarray,
+    ) -> str:
+        """
+        Removes the low surprisal tokens of a scored message, keeping protected segments as they are.
+
+        Args:
+            content (str): The original message content, protect tags included.
+            segments (List[Tuple[str, bool]]): The message segments, see `message_segments`.
+            segment_ids (List[List[int]]): The token IDs of each segment.
+            entropies (np.ndarray): The entropy value of each message token.
+
+        Returns:
+            str: The compressed message content.
+        """
+        removable = np.concatenate(
+            [np.full(len(ids), not protected) for (_, protected), ids in zip(segments, segment_ids)]
+            + [np.zeros(0, dtype=bool)]
+        )
+
+        def render(keep: np.ndarray) -> str:
+            comp_parts = []
+            offset = 0
+            for (text, protected), ids in zip(segments, segment_ids):
+                if protected:
+                    comp_parts.append(text)
+                else:
+                    kept_ids = [i for i, k in zip(ids, keep[offset : offset + len(ids)]) if k]
+                    comp_parts.append(self.tokenizer.decode(kept_ids))
+                offset += len(ids)
+            return "".join(comp_parts)
+
+        return render(self.keep_mask(entropies, render, content, removable))
+
+    def compress_protected_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Compresses several prompts with protect tags, each scored as a whole in one batched pass: the
+        protected spans are context for the model, but only the tokens of unprotected spans can be removed.
+
+        Args:
+            prompts (List[str]): The prompt texts, protect tags included.
+
+        Returns:
+            List[str]: The compressed prompt texts, in the same order as `prompts`.
+        """
+        batch_segments = [self.message_segments(prompt) for prompt in prompts]
+        batch_segment_ids = [
+            [self.tokenizer.encode(text, add_special_tokens=False, verbose=False) for text, _ in segments]
+            for segments in batch_segments
+        ]
+        entropy_mappings = self.score_sequences(
+            [[t for ids in segment_ids for t in ids] for segment_ids in batch_segment_ids]
+        )
+        return [
+            self.compress_message(prompt, segments, segment_ids, entropies)
+            for prompt, segments, segment_ids, (_, entropies) in zip(
+                prompts, batch_segments, batch_segment_ids, entropy_mappings
+            )
+        ]
+
+    def scores_whole_prompts(self) -> bool:
+        """
+        Whether protected prompts are scored whole rather than chunk by chunk: with `protect_context`, and
+        with `target_tokens`, whose budget applies to the whole prompt and can't be met chunk by chunk.
+        """
+        return self.protect_tag is not None and (
+            self.protect_context or self.target_tokens is not None
+        )
+
+    def run(self, prompt: str) -> str:
+        """
+        Does protected compression of the prompt, see `run_batch`.
+
+        Args:
+            prompt (str): The prompt text.
+
+        Returns:
+            str: The protected compressed prompt text.
+        """
+        if not self.scores_whole_prompts():
+            return super().run(prompt)
+        return self.run_batch([prompt])[0]
+
+    def run_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Does protected compression of several prompts at once. With `protect_context` or `target_tokens`,
+        every prompt is scored whole with `compress_protected_batch` instead of chunk by chunk.
+
+        Args:
+            prompts (List[str]): The prompt texts.
+
+        Returns:
+            List[str]: The protected compressed prompt texts.
+        """
+        if not self.scores_whole_prompts():
+            return super().run_batch(prompts)
+        if self.result_cache is None:
+            return self.compress_protected_batch(prompts)
+        return self.result_cache.map(
+            f"{self.fingerprint()}:{self.protect_tag!r}", prompts, self.compress_protected_batch
+        )
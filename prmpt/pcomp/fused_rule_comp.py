@@ -0,0 +1,193 @@
+import re
+import string
+from typing import Iterable, Iterator
+
+from prmpt.pcomp.base import PromptComp
+from prmpt.pcomp.utils import stream_protect_tags
+
+class FusedRuleComp(PromptComp):
+    """
+    FusedRuleComp is a prompt compression technique that applies several cheap text rules at once:
+    punctuation removal, filler phrase and stopword removal, and whitespace collapsing. The rules are
+    compiled into one translation table and one regular expression, so the text is scanned once by each
+    instead of once per rule as with a `Sequential` of single rule compressors.
+
+    Filler phrases and stopwords are matched on whole words, after punctuation removal.
+
+    It inherits from the PromptComp base class.
+
+    Example:
+        >>> from prmpt.pcomp import FusedRuleComp
+        >>> p_compressor = FusedRuleComp(fillers=["you know", "basically"], stopwords=["the", "a"])
+        >>> res = p_compressor("example prompt...")
+        >>> compressed_prompt = res.content
+    """
+
+    def __init__(
+        self,
+        punctuation: str = string.punctuation,
+        fillers: Iterable[str] = (),
+        stopwords: Iterable[str] = (),
+        collapse_whitespace: bool = True,
+        ignore_case: bool = True,
+        verbose: bool = False,
+        metrics: list = [],
+        **kwargs,
+    ):
+        """
+        Initializes the FusedRuleComp.
+
+        Args:
+            punctuation (str, optional): The characters to remove. Defaults to `string.punctuation`.
+            fillers (Iterable[str], optional): The filler phrases to remove, e.g. "you know". Defaults to none.
+            stopwords (Iterable[str], optional): The stopwords to remove. Defaults to none.
+            collapse_whitespace (bool, optional): Whether to replace whitespace runs with a single space and strip the text. Defaults to True.
+            ignore_case (bool, optional): Whether filler phrases and stopwords are matched case-insensitively. Defaults to True.
+            verbose (bool, optional): Flag indicating whether to enable verbose output. Defaults to False.
+            metrics (list, optional): A list of metric names to evaluate during compression. Defaults to an empty list.
+        """
+        super().__init__(verbose, metrics, **kwargs)
+        self.punctuation = punctuation
+        self.fillers = tuple(fillers)
+        self.stopwords = tuple(stopwords)
+        self.collapse_whitespace = collapse_whitespace
+        self.ignore_case = ignore_case
+        self.table = str.maketrans("", "", punctuation)
+
+        phrases = {
+            tuple(phrase.translate(self.table).split())
+            for phrase in self.fillers + self.stopwords
+        }
+        phrases.discard(())
+        self.max_phrase_words = max((len(words) for words in phrases), default=1)
+        alternatives = sorted(
+            (r"\s+".join(re.escape(word) for word in words) for words in phrases),
+            key=len,
+            reverse=True,
+        )
+        removable = rf"\b(?:{'|'.join(alternatives)})\b" if alternatives else None
+
+        flags = re.IGNORECASE if ignore_case else 0
+        if collapse_whitespace:
+            pattern = rf"(?:\s+|{removable})+" if removable else r"\s+"
+            self.pattern, self.replacement = re.compile(pattern, flags), " "
+        elif removable:
+            self.pattern, self.replacement = re.compile(rf"\s*{removable}", flags), ""
+        else:
+            self.pattern = None
+
+    def get_config(self) -> dict:
+        """
+        Returns the constructor arguments that rebuild the compressor, see `PromptComp.get_config`.
+
+        Returns:
+            dict: The arguments by name.
+        """
+        return {
+            **super().get_config(),
+            "punctuation": self.punctuation,
+            "fillers": self.fillers,
+            "stopwords": self.stopwords,
+            "collapse_whitespace": self.collapse_whitespace,
+            "ignore_case": self.ignore_case,
+        }
+
+    def compress(self, prompt: str) -> str:
+        """
+        Runs the fused rules on the prompt.
+
+        Args:
+            prompt (str): The prompt text.
+
+        Returns:
+            str: The compressed prompt text.
+        """
+        return self.apply(prompt.translate(self.table))
+
+    def apply(self, text: str) -> str:
+        """
+        Runs the compiled regular expression on text whose punctuation is already removed.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            str: The compressed text.
+        """
+        if self.pattern is not None:
+            text = self.pattern.sub(self.replacement, text)
+        if self.collapse_whitespace:
+            text = text.strip()
+        return text
+
+    def compress_stream(
+        self,
+        chunks: Iterable[str],
+        segment_chars: int = 16384,
+        context_chars: int = 1024,
+    ) -> Iterator[str]:
+        """
+        Compresses text arriving in chunks, e.g. read from a file or a socket, in bounded memory. The output
+        pieces concatenate to `run` of the concatenated chunks, protect tags included.
+
+        Text is held back from the end of each chunk until it can no longer be part of a filler phrase that
+        continues in the next chunk. `segment_chars` and `context_chars` are unused: the rules need no more
+        context than the longest filler phrase.
+
+        Args:
+            chunks (Iterable[str]): The text chunks.
+            segment_chars (int, optional): Unused. Defaults to `16384`.
+            context_chars (int, optional): Unused. Defaults to `1024`.
+
+        Yields:
+            str: The compressed text pieces.
+        """
+        buffer = ""
+        emitted = False
+        for text, protected in stream_protect_tags(chunks, self.protect_tag):
+            if protected:
+                piece = self.apply(buffer)
+                if piece:
+                    yield " " + piece if self.collapse_whitespace and emitted else piece
+                buffer, emitted = "", False
+                if text:
+                    yield text
+                continue
+
+            buffer += text.translate(self.table)
+            cut = self.stream_cut(buffer)
+            if cut <= 0:
+                continue
+            piece = self.apply(buffer[:cut])
+            buffer = buffer[cut:]
+            if piece:
+                yield " " + piece if self.collapse_whitespace and emitted else piece
+                emitted = True
+
+        piece = self.apply(buffer)
+        if piece:
+            yield " " + piece if self.collapse_whitespace and emitted else piece
+
+    def stream_cut(self, text: str) -> int:
+        """
+        Finds how much of the streaming buffer can be compressed without looking at the next chunk: up to the
+        whitespace run before the last `max_phrase_words` words, the last one possibly incomplete, moved back
+        to the start of any match it falls in.
+
+        Args:
+            text (str): The streaming buffer, punctuation removed.
+
+        Returns:
+            int: The cut offset, `0` if nothing can be compressed yet.
+        """
+        cuts = [m.start() for m in re.finditer(r"\s+", text)]
+        if len(cuts) < self.max_phrase_words:
+            return 0
+        cut = cuts[-self.max_phrase_words]
+        if self.pattern is not None:
+            for m in self.pattern.finditer(text):
+                if m.start() >= cut:
+                    break
+                if cut < m.end():
+                    cut = m.start()
+        return cut
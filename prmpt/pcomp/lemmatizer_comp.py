@@ -1,13 +1,33 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
 import nltk
-from nltk.corpus import wordnet
+from nltk.corpus.reader.wordnet import ADJ, ADV, NOUN, VERB
 from nltk.stem import WordNetLemmatizer
 
 from prmpt.pcomp.base import PromptComp
+from prmpt.pcomp.resources import LemmaTable, ensure_nltk_resource
+
+TAG_DICT = {
+    "J": ADJ,
+    "N": NOUN,
+    "V": VERB,
+    "R": ADV,
+}
 
 class LemmatizerComp(PromptComp):
     """
     LemmatizerComp is a prompt compression technique based on lemmatization.
 
+    Words are POS tagged in one pass over the prompt, and the lemma of every `(word, POS)` pair is
+    memoized in a bounded LRU cache, optionally persisted to a JSON file between runs.
+
+    NLTK data is looked up locally first and only downloaded when missing (never with `offline=True`).
+    Words covered by a precomputed `LemmaTable` are lemmatized without loading WordNet at all.
+
     It inherits from the PromptComp base class.
 
     Example:
@@ -17,18 +37,65 @@ class LemmatizerComp(PromptComp):
         >>> compressed_prompt = res.content
     """
 
-    def __init__(self, verbose: bool = False, metrics: list = []):
+    def __init__(
+        self,
+        verbose: bool = False,
+        metrics: list = [],
+        memo_size: int = 100000,
+        memo_path: Optional[str] = None,
+        data_dir: Optional[str] = None,
+        offline: bool = False,
+        lemma_table: Optional[Union[str, LemmaTable]] = None,
+        **kwargs,
+    ):
         """
         Initializes the LemmatizerComp.
 
         Args:
             verbose (bool, optional): Flag indicating whether to enable verbose output. Defaults to False.
             metrics (list, optional): A list of metric names to evaluate during compression. Defaults to an empty list.
+            memo_size (int, optional): The maximum number of `(word, POS)` lemmas memoized. Defaults to `100000`.
+            memo_path (str, optional): JSON file the lemma memo is loaded from and saved to with `save_memo`. Defaults to `None` i.e. not persisted.
+            data_dir (str, optional): Directory searched first for NLTK data and used for downloads. Defaults to `None` i.e. NLTK default locations.
+            offline (bool, optional): Whether to fail instead of downloading missing NLTK data. Defaults to False.
+            lemma_table (Union[str, LemmaTable], optional): A precomputed lemma table, or the path of one saved with `LemmaTable.save`. Defaults to `None`.
+        """
+        super().__init__(verbose, metrics, **kwargs)
+        self.data_dir = data_dir
+        self.offline = offline
+        ensure_nltk_resource("averaged_perceptron_tagger", data_dir, offline)
+        self.lemmatizer = None
+
+        if isinstance(lemma_table, str):
+            lemma_table = LemmaTable.load(lemma_table)
+        self.lemma_table = lemma_table
+
+        self.memo_size = memo_size
+        self.memo_path = memo_path
+        self.memo = OrderedDict()
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self._lock = threading.Lock()
+        if memo_path is not None and os.path.exists(memo_path):
+            with open(memo_path, "r") as f:
+                for key, lemma in json.load(f):
+                    self.memo[tuple(key)] = lemma
+
+    def get_config(self) -> dict:
+        """
+        Returns the constructor arguments that rebuild the compressor, see `PromptComp.get_config`.
+
+        Returns:
+            dict: The arguments by name.
         """
-        super().__init__(verbose, metrics)
-        self.lemmatizer = WordNetLemmatizer()
-        nltk.download("averaged_perceptron_tagger")
-        nltk.download("wordnet")
+        return {
+            **super().get_config(),
+            "memo_size": self.memo_size,
+            "memo_path": self.memo_path,
+            "data_dir": self.data_dir,
+            "offline": self.offline,
+            "lemma_table": self.lemma_table,
+        }
 
     def get_wordnet_pos(self, word: str) -> str:
         """
@@ -40,15 +107,86 @@ class LemmatizerComp(PromptComp):
         Returns:
             str: The WordNet POS tag.
         """
-        tag = nltk.pos_tag([word])[0][1][0].upper()
-        tag_dict = {
-            "J": wordnet.ADJ,
-            "N": wordnet.NOUN,
-            "V": wordnet.VERB,
-            "R": wordnet.ADV,
+        return self.wordnet_pos(nltk.pos_tag([word])[0][1])
+
+    @staticmethod
+    def wordnet_pos(tag: str) -> str:
+        """
+        Maps a Penn Treebank POS tag to a WordNet POS tag.
+
+        Args:
+            tag (str): The Penn Treebank POS tag.
+
+        Returns:
+            str: The WordNet POS tag.
+        """
+        return TAG_DICT.get(tag[:1].upper(), NOUN)
+
+    def lemmatize(self, word: str, pos: str) -> str:
+        """
+        Lemmatizes a word, going through the lemma memo and the lemma table. WordNet is loaded on the
+        first word neither of them covers.
+
+        Args:
+            word (str): The word.
+            pos (str): The WordNet POS tag of the word.
+
+        Returns:
+            str: The lemma.
+        """
+        key = (word, pos)
+        with self._lock:
+            lemma = self.memo.get(key)
+            if lemma is not None:
+                self.memo_hits += 1
+                self.memo.move_to_end(key)
+                return lemma
+            self.memo_misses += 1
+
+        if self.lemma_table is not None:
+            lemma = self.lemma_table.lookup(word, pos)
+        if lemma is None:
+            with self._lock:
+                if self.lemmatizer is None:
+                    ensure_nltk_resource("wordnet", self.data_dir, self.offline)
+                    self.lemmatizer = WordNetLemmatizer()
+            lemma = self.lemmatizer.lemmatize(word, pos)
+
+        with self._lock:
+            self.memo[key] = lemma
+            if len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        return lemma
+
+    def memo_stats(self) -> dict:
+        """
+        Returns the lemma memo counters.
+
+        Returns:
+            dict: The hit and miss counts, the hit rate and the number of memoized lemmas.
+        """
+        lookups = self.memo_hits + self.memo_misses
+        return {
+            "hits": self.memo_hits,
+            "misses": self.memo_misses,
+            "hit_rate": self.memo_hits / lookups if lookups else 0.0,
+            "entries": len(self.memo),
         }
-        return tag_dict.get(tag, wordnet.NOUN)
-    
+
+    def save_memo(self, memo_path: Optional[str] = None) -> None:
+        """
+        Saves the lemma memo to a JSON file.
+
+        Args:
+            memo_path (str, optional): The file to write. Defaults to `None` i.e. `self.memo_path`.
+        """
+        memo_path = memo_path or self.memo_path
+        assert memo_path is not None, "No memo path to save the lemma memo to"
+        with open(memo_path, "w") as f:
+            with self._lock:
+                entries = [[list(key), lemma] for key, lemma in self.memo.items()]
+            json.dump(entries, f)
+
     def compress(self, prompt: str) -> str:
         """
         Runs the lemmatizer prompt compression technique on the prompt.
@@ -61,8 +199,8 @@ class LemmatizerComp(PromptComp):
         """
         words = prompt.split()
         lemmatized_words = [
-            self.lemmatizer.lemmatize(word, self.get_wordnet_pos(word))
-            for word in words
+            self.lemmatize(word, self.wordnet_pos(tag))
+            for word, tag in nltk.pos_tag(words)
         ]
         comp_prompt = " ".join(lemmatized_words)
-        return comp_prompt
\ No newline at end of file
+        return comp_prompt
@@ -0,0 +1,144 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Iterable, List
+
+EXECUTORS = ("thread", "process")
+EXCLUDED_ARGS = ("verbose", "metrics", "result_cache", "cache", "pool")
+
+class CompSpec:
+    """
+    CompSpec is a picklable recipe of a prompt compressor: its class and its `get_config` arguments,
+    without the verbose flag, the metrics, the caches and the execution pool, which are not sent to other
+    processes. Process workers rebuild their compressor from it once, instead of receiving a pickled
+    compressor (and its models) with every task.
+
+    Example:
+        >>> spec = CompSpec.from_comp(p_compressor)
+        >>> p_compressor_copy = spec.build()
+    """
+
+    def __init__(self, cls: type, config: dict = {}):
+        """
+        Initializes the CompSpec.
+
+        Args:
+            cls (type): The compressor class.
+            config (dict, optional): The constructor arguments by name. Compressors are given as their own CompSpec. Defaults to none.
+        """
+        self.cls = cls
+        self.config = config
+
+    @classmethod
+    def from_comp(cls, comp: Any) -> "CompSpec":
+        """
+        Builds the spec of a compressor from its `get_config` arguments.
+
+        Args:
+            comp (Any): A `PromptComp` or `Sequential`.
+
+        Returns:
+            CompSpec: The spec.
+        """
+        return cls(
+            type(comp),
+            {
+                name: cls.wrap(value)
+                for name, value in comp.get_config().items()
+                if name not in EXCLUDED_ARGS
+            },
+        )
+
+    @classmethod
+    def wrap(cls, value: Any) -> Any:
+        """
+        Replaces compressors, alone or in a list, by their spec; other values are returned as they are.
+        """
+        if isinstance(value, list):
+            return [cls.wrap(item) for item in value]
+        return cls.from_comp(value) if hasattr(value, "get_config") else value
+
+    @classmethod
+    def unwrap(cls, value: Any) -> Any:
+        """
+        Builds the compressors of specs, alone or in a list; other values are returned as they are.
+        """
+        if isinstance(value, list):
+            return [cls.unwrap(item) for item in value]
+        return value.build() if isinstance(value, CompSpec) else value
+
+    def build(self) -> Any:
+        """
+        Constructs a new compressor from the spec.
+
+        Returns:
+            Any: The compressor.
+        """
+        return self.cls.from_config(
+            {name: self.unwrap(value) for name, value in self.config.items()}
+        )
+
+_worker_comp = None
+
+def _init_worker(spec: CompSpec) -> None:
+    global _worker_comp
+    _worker_comp = spec.build()
+
+def _run_worker_chunk(chunk: list, **call_kwargs) -> list:
+    return _worker_comp.run_data_batch(chunk, **call_kwargs)
+
+def compress_many(
+    comp: Any,
+    prompts_data: Iterable,
+    workers: int = 1,
+    executor: str = "thread",
+    chunksize: int = 16,
+    skip_system: bool = False,
+    json: bool = False,
+    langchain: bool = False,
+) -> List[Any]:
+    """
+    Compresses many prompts, or chats in JSON/langchain mode, across workers. The prompts are split into
+    chunks of `chunksize`, each compressed with one `run_data_batch` call.
+
+    Thread workers share `comp`, so they suit compressors whose work releases the GIL (e.g. model
+    inference). Process workers suit CPU-bound Python compressors: each process rebuilds the compressor
+    once from its `CompSpec`, so the constructor arguments must be picklable.
+
+    Args:
+        comp (Any): A `PromptComp` or `Sequential`.
+        prompts_data (Iterable): The prompts, or chats in JSON/langchain mode.
+        workers (int, optional): The number of workers. Defaults to `1` i.e. run in the calling thread.
+        executor (str, optional): The worker type, `"thread"` or `"process"`. Defaults to `"thread"`.
+        chunksize (int, optional): The number of prompts sent to a worker at once. Defaults to `16`.
+        skip_system (bool, optional): Whether to skip system prompts. Defaults to False.
+        json (bool, optional): Whether the prompt data is in JSON format. Defaults to False.
+        langchain (bool, optional): Whether the prompt data is in langchain format. Defaults to False.
+
+    Returns:
+        List[Any]: The compressed prompt data, in the order of `prompts_data`.
+    """
+    assert executor in EXECUTORS, f"executor must be one of {EXECUTORS}, got {executor}"
+    assert workers >= 1 and chunksize >= 1, "workers and chunksize must be positive"
+
+    prompts_data = list(prompts_data)
+    call_kwargs = dict(skip_system=skip_system, json=json, langchain=langchain)
+    chunks = [
+        prompts_data[i : i + chunksize] for i in range(0, len(prompts_data), chunksize)
+    ]
+
+    if workers == 1 or len(chunks) <= 1:
+        comp_chunks = [comp.run_data_batch(chunk, **call_kwargs) for chunk in chunks]
+    elif executor == "thread":
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            comp_chunks = list(
+                pool.map(partial(comp.run_data_batch, **call_kwargs), chunks)
+            )
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(CompSpec.from_comp(comp),),
+        ) as pool:
+            comp_chunks = list(pool.map(partial(_run_worker_chunk, **call_kwargs), chunks))
+
+    return [comp_data for comp_chunk in comp_chunks for comp_data in comp_chunk]
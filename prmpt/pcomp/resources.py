@@ -0,0 +1,292 @@
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from collections.abc import Mapping
+from typing import Iterable, Iterator, Optional
+
+import nltk
+from nltk.corpus.reader.wordnet import ADJ, ADV, NOUN, VERB
+
+NLTK_RESOURCES = {
+    "averaged_perceptron_tagger": (
+        "taggers/averaged_perceptron_tagger_eng/",
+        "taggers/averaged_perceptron_tagger/",
+    ),
+    "wordnet": ("corpora/wordnet",),
+}
+
+def _download_name(name: str) -> str:
+    if name == "averaged_perceptron_tagger":
+        version = tuple(int(v) for v in nltk.__version__.split(".")[:2] if v.isdigit())
+        if version >= (3, 9):
+            return "averaged_perceptron_tagger_eng"
+    return name
+
+def ensure_nltk_resource(
+    name: str, data_dir: Optional[str] = None, offline: bool = False
+) -> None:
+    """
+    Makes sure an NLTK data package is available, looking for it locally before anything else. The
+    package is only downloaded when it is missing, so startup never touches the network once the
+    data is present.
+
+    Args:
+        name (str): The NLTK package name, `"averaged_perceptron_tagger"` or `"wordnet"`.
+        data_dir (str, optional): Directory searched first and used for downloads. Defaults to `None` i.e. NLTK default locations.
+        offline (bool, optional): Whether to raise instead of downloading a missing package. Defaults to False.
+
+    Raises:
+        LookupError: If the package is missing and `offline` is True or the download failed.
+    """
+    if data_dir is not None:
+        data_dir = os.path.expanduser(data_dir)
+        if data_dir not in nltk.data.path:
+            nltk.data.path.insert(0, data_dir)
+
+    for resource_path in NLTK_RESOURCES.get(name, (name,)):
+        try:
+            nltk.data.find(resource_path)
+            return
+        except LookupError:
+            continue
+
+    if offline:
+        raise LookupError(
+            f"NLTK resource `{name}` not found in {nltk.data.path} and downloads are disabled"
+        )
+    if not nltk.download(_download_name(name), download_dir=data_dir, quiet=True):
+        raise LookupError(f"NLTK resource `{name}` could not be downloaded")
+
+class LemmaTable:
+    """
+    LemmaTable is a precomputed `(word, POS) -> lemma` table for a fixed vocabulary. Looking a word up
+    in the table needs neither WordNet nor its corpus reader, so workers that load a table start without
+    reading the WordNet corpus. Only lemmas differing from their word are stored.
+
+    Example:
+        >>> table = LemmaTable.build(vocabulary)
+        >>> table.save("lemmas.pkl")
+        >>> table = LemmaTable.load("lemmas.pkl")
+        >>> table.lookup("running", "v")
+        'run'
+    """
+
+    POS = (ADJ, ADV, NOUN, VERB)
+
+    def __init__(self, words: frozenset, lemmas: dict):
+        """
+        Initializes the LemmaTable.
+
+        Args:
+            words (frozenset): The vocabulary covered by the table.
+            lemmas (dict): The `(word, POS) -> lemma` entries whose lemma differs from the word.
+        """
+        self.words = words
+        self.lemmas = lemmas
+        self._fingerprint = None
+
+    def fingerprint(self) -> str:
+        """
+        Returns a digest of the table content, the same in every process. It is computed once, as
+        tables are not modified after they are built.
+
+        Returns:
+            str: The digest.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for word in sorted(self.words):
+                digest.update(f"{word}\0".encode("utf-8"))
+            for (word, pos), lemma in sorted(self.lemmas.items()):
+                digest.update(f"{word}\1{pos}\1{lemma}\0".encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    @classmethod
+    def build(cls, words: Iterable[str], lemmatizer=None) -> "LemmaTable":
+        """
+        Lemmatizes every word of a vocabulary for every WordNet POS.
+
+        Args:
+            words (Iterable[str]): The vocabulary, e.g. the words of a prompt corpus.
+            lemmatizer (optional): The lemmatizer. Defaults to `None` i.e. `WordNetLemmatizer`.
+
+        Returns:
+            LemmaTable: The table.
+        """
+        if lemmatizer is None:
+            from nltk.stem import WordNetLemmatizer
+
+            lemmatizer = WordNetLemmatizer()
+
+        words = frozenset(words)
+        lemmas = {}
+        for word in words:
+            for pos in cls.POS:
+                lemma = lemmatizer.lemmatize(word, pos)
+                if lemma != word:
+                    lemmas[(word, pos)] = lemma
+        return cls(words, lemmas)
+
+    def lookup(self, word: str, pos: str) -> Optional[str]:
+        """
+        Returns the lemma of a word.
+
+        Args:
+            word (str): The word.
+            pos (str): The WordNet POS tag.
+
+        Returns:
+            Optional[str]: The lemma, or `None` if the word is not covered by the table.
+        """
+        if word not in self.words:
+            return None
+        return self.lemmas.get((word, pos), word)
+
+    def save(self, path: str) -> None:
+        """
+        Writes the table to a file.
+
+        Args:
+            path (str): The file to write.
+        """
+        with open(os.path.expanduser(path), "wb") as f:
+            pickle.dump((self.words, self.lemmas), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "LemmaTable":
+        """
+        Reads a table written by `save`.
+
+        Args:
+            path (str): The file to read.
+
+        Returns:
+            LemmaTable: The table.
+        """
+        with open(os.path.expanduser(path), "rb") as f:
+            words, lemmas = pickle.load(f)
+        return cls(words, lemmas)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+class SpellerDictionary(Mapping):
+    """
+    SpellerDictionary is a read-only `word -> count` mapping backed by a memory-mapped snapshot of a
+    speller word-frequency dictionary. Opening a snapshot neither decompresses nor parses anything: words
+    are found through an open addressing hash table stored in the file, and forked worker processes share
+    the mapped pages.
+
+    The snapshot holds a header, the hash table slots, the word offsets, the word counts and the UTF-8
+    encoded words.
+
+    Example:
+        >>> from autocorrect import Speller, load_from_tar
+        >>> SpellerDictionary.build(load_from_tar("en"), "en.spell")
+        >>> spell = Speller(lang="en", nlp_data=SpellerDictionary("en.spell"))
+    """
+
+    MAGIC = b"PRMPTSPL"
+    HEADER = struct.Struct("<8sIII")
+
+    def __init__(self, path: str):
+        """
+        Opens a snapshot written by `build`.
+
+        Args:
+            path (str): The snapshot path.
+        """
+        self.path = os.path.expanduser(path)
+        with open(self.path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, n_words, n_slots = self.HEADER.unpack_from(self.mmap)
+        assert magic == self.MAGIC, f"{path} is not a speller dictionary snapshot"
+
+        view = memoryview(self.mmap)
+        offset = self.HEADER.size
+        self.slots = view[offset : offset + 4 * n_slots].cast("i")
+        offset += 4 * n_slots
+        self.offsets = view[offset : offset + 4 * (n_words + 1)].cast("I")
+        offset += 4 * (n_words + 1)
+        self.counts = view[offset : offset + 8 * n_words].cast("q")
+        self.words_offset = offset + 8 * n_words
+        self.n_words = n_words
+        self.mask = n_slots - 1
+
+    @classmethod
+    def build(cls, nlp_data: dict, path: str) -> "SpellerDictionary":
+        """
+        Writes a snapshot of a word-frequency dictionary and opens it.
+
+        Args:
+            nlp_data (dict): The `word -> count` dictionary, e.g. `Speller(lang="en").nlp_data`.
+            path (str): The snapshot path.
+
+        Returns:
+            SpellerDictionary: The opened snapshot.
+        """
+        path = os.path.expanduser(path)
+        words = [word.encode("utf-8") for word in nlp_data]
+        n_slots = 1 << max(1, (2 * len(words) - 1).bit_length())
+        slots = [-1] * n_slots
+        for i, word in enumerate(words):
+            slot = zlib.crc32(word) & (n_slots - 1)
+            while slots[slot] >= 0:
+                slot = (slot + 1) & (n_slots - 1)
+            slots[slot] = i
+
+        offsets = [0]
+        for word in words:
+            offsets.append(offsets[-1] + len(word))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, 1, len(words), n_slots))
+            f.write(struct.pack(f"<{n_slots}i", *slots))
+            f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            f.write(struct.pack(f"<{len(words)}q", *nlp_data.values()))
+            f.write(b"".join(words))
+        os.replace(f"{path}.tmp", path)
+        return cls(path)
+
+    def _find(self, word: str) -> int:
+        if not isinstance(word, str):
+            return -1
+        key = word.encode("utf-8")
+        slots, offsets = self.slots, self.offsets
+        slot = zlib.crc32(key) & self.mask
+        while True:
+            i = slots[slot]
+            if i < 0:
+                return -1
+            start, end = offsets[i], offsets[i + 1]
+            if end - start == len(key):
+                start += self.words_offset
+                if self.mmap[start : start + len(key)] == key:
+                    return i
+            slot = (slot + 1) & self.mask
+
+    def __getitem__(self, word: str) -> int:
+        i = self._find(word)
+        if i < 0:
+            raise KeyError(word)
+        return self.counts[i]
+
+    def get(self, word: str, default=None):
+        i = self._find(word)
+        return default if i < 0 else self.counts[i]
+
+    def __contains__(self, word) -> bool:
+        return self._find(word) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self.n_words):
+            start = self.words_offset + self.offsets[i]
+            yield self.mmap[start : self.words_offset + self.offsets[i + 1]].decode("utf-8")
+
+    def __len__(self) -> int:
+        return self.n_words
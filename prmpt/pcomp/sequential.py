@@ -1,7 +1,9 @@
-from typing import Any, List
+from typing import Any, Iterable, List
 
 from prmpt.pcomp.base import PromptComp
 
+from .cache import ResultCache
+from .parallel import compress_many
 from .utils import DotDict
 
 class Sequential:
@@ -32,6 +34,29 @@ class Sequential:
         """
         self.comps: List[PromptComp] = list(comps)
 
+    def get_config(self) -> dict:
+        """
+        Returns the constructor arguments that rebuild the composition, see `from_config`.
+
+        Returns:
+            dict: The stages as `comps`.
+        """
+        return {"comps": list(self.comps)}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "Sequential":
+        """
+        Builds a composition from the arguments returned by `get_config`.
+
+        Args:
+            config (dict): The constructor arguments by name.
+
+        Returns:
+            Sequential: The composition.
+        """
+        config = dict(config)
+        return cls(*config.pop("comps"), **config)
+
     def __call__(self, x: Any) -> Any:
         """
         Applies the sequential composition of prompt compression techniques to the prompt.
@@ -48,4 +73,187 @@ class Sequential:
             d = comp(d.content)
         return d
 
+    def run_data_batch(
+        self,
+        prompts_data: list,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> list:
+        """
+        Applies every stage to a list of prompt data with `PromptComp.run_data_batch`, without computing metrics.
+
+        Args:
+            prompts_data (list): The prompt texts, or the chats in JSON/langchain mode.
+            skip_system: A boolean indicating whether to skip system prompts. Default is False.
+            json: A boolean indicating whether the prompt data is in JSON format. Default is False.
+            langchain: A boolean indicating whether the prompt data is in langchain format. Default is False.
+
+        Returns:
+            list: The compressed prompt data, in order.
+        """
+        for comp in self.comps:
+            prompts_data = comp.run_data_batch(prompts_data, skip_system, json, langchain)
+        return prompts_data
+
+    def compress_many(
+        self,
+        prompts_data: Iterable,
+        workers: int = 1,
+        executor: str = "thread",
+        chunksize: int = 16,
+        skip_system: bool = False,
+        json: bool = False,
+        langchain: bool = False,
+    ) -> list:
+        """
+        Compresses many prompts, or chats in JSON/langchain mode, across thread or process workers,
+        see `PromptComp.compress_many`.
+
+        Args:
+            prompts_data (Iterable): The prompts, or chats in JSON/langchain mode.
+            workers (int, optional): The number of workers. Defaults to `1` i.e. run in the calling thread.
+            executor (str, optional): The worker type, `"thread"` or `"process"`. Defaults to `"thread"`.
+            chunksize (int, optional): The number of prompts sent to a worker at once. Defaults to `16`.
+            skip_system: A boolean indicating whether to skip system prompts. Default is False.
+            json: A boolean indicating whether the prompt data is in JSON format. Default is False.
+            langchain: A boolean indicating whether the prompt data is in langchain format. Default is False.
+
+        Returns:
+            list: The compressed prompt data, in the order of `prompts_data`.
+        """
+        return compress_many(
+            self, prompts_data, workers, executor, chunksize, skip_system, json, langchain
+        )
+
+    def compile(
+        self,
+        verbose: bool = False,
+        metrics: list = [],
+        protect_tag: str = None,
+        result_cache: ResultCache = None,
+    ) -> "CompiledSequential":
+        """
+        Compiles the composition into a single prompt compressor, see `CompiledSequential`.
+
+        Args:
+            verbose (bool, optional): Flag indicating whether to enable verbose output. Defaults to False.
+            metrics (list, optional): A list of metric names to evaluate on the final output. Defaults to an empty list.
+            protect_tag (str, optional): markup style tag string to indicate protected content that no stage can delete or modify. Defaults to `None`.
+            result_cache (ResultCache, optional): A cache of the whole pipeline's compressed chunks. Defaults to `None` i.e. no caching.
+
+        Returns:
+            CompiledSequential: The compiled pipeline.
+        """
+        return CompiledSequential(
+            *self.comps,
+            verbose=verbose,
+            metrics=metrics,
+            protect_tag=protect_tag,
+            result_cache=result_cache,
+        )
+
+class CompiledSequential(PromptComp):
+    """
+    CompiledSequential runs a sequence of prompt compression techniques as one prompt compressor.
+
+    Unlike `Sequential`, which calls every stage in full, the protect tags are parsed once and every
+    stage runs `compress_batch` directly on the unprotected chunks, so protected content stays protected
+    through all the stages. The data is copied once, the metrics are only computed on the final output,
+    and the stage metrics and verbose flags are ignored. Each stage only sees the distinct non-empty
+    chunks left by the previous one, through the stage's own `result_cache` if it has one. Every stage
+    runs on every chunk: whether a stage leaves a chunk unchanged is only known once it has run.
+
+    It inherits from the PromptComp base class, so it accepts the same `json`, `langchain` and
+    `skip_system` arguments as a single compressor.
+
+    Example:
+        >>> from prmpt.pcomp import LemmatizerComp, PunctuationComp, Sequential
+        >>> p_compressor = Sequential(PunctuationComp(), LemmatizerComp()).compile(protect_tag="keep")
+        >>> res = p_compressor([{"role": "user", "content": "example prompt..."}], json=True)
+        >>> compressed_messages = res.content
+    """
+
+    def __init__(
+        self,
+        *comps: PromptComp,
+        verbose: bool = False,
+        metrics: list = [],
+        protect_tag: str = None,
+        result_cache: ResultCache = None,
+    ):
+        """
+        Initializes the CompiledSequential.
+
+        Args:
+            *comps: Variable-length argument list of prompt compression techniques.
+            verbose (bool, optional): Flag indicating whether to enable verbose output. Defaults to False.
+            metrics (list, optional): A list of metric names to evaluate on the final output. Defaults to an empty list.
+            protect_tag (str, optional): markup style tag string to indicate protected content that no stage can delete or modify. Defaults to `None`.
+            result_cache (ResultCache, optional): A cache of the whole pipeline's compressed chunks. Defaults to `None` i.e. no caching.
+        """
+        super().__init__(verbose, metrics, protect_tag, result_cache)
+        self.comps: List[PromptComp] = list(comps)
+
+    def get_config(self) -> dict:
+        """
+        Returns the constructor arguments that rebuild the compressor, see `PromptComp.get_config`.
+
+        Returns:
+            dict: The arguments by name, the stages as `comps`.
+        """
+        return {"comps": list(self.comps), **super().get_config()}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "CompiledSequential":
+        """
+        Builds a compiled pipeline from the arguments returned by `get_config`.
+
+        Args:
+            config (dict): The constructor arguments by name.
+
+        Returns:
+            CompiledSequential: The compiled pipeline.
+        """
+        config = dict(config)
+        return cls(*config.pop("comps"), **config)
+
+    def compress(self, prompt: str) -> str:
+        """
+        Runs all the stages on the prompt.
+
+        Args:
+            prompt (str): The prompt text.
+
+        Returns:
+            str: The compressed prompt text.
+        """
+        return self.compress_batch([prompt])[0]
+
+    def compress_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Runs all the stages on a list of prompts, each stage with one `compress_batch` call over the distinct
+        non-empty texts left by the previous stage.
+
+        Args:
+            prompts (List[str]): The prompt texts.
+
+        Returns:
+            List[str]: The compressed prompt texts, in the same order as `prompts`.
+        """
+        comp_prompts = list(prompts)
+        for comp in self.comps:
+            texts = list(dict.fromkeys(text for text in comp_prompts if len(text)))
+            if not texts:
+                break
+            if comp.result_cache is not None:
+                comp_texts = comp.result_cache.map(
+                    comp.fingerprint(), texts, comp.compress_batch
+                )
+            else:
+                comp_texts = comp.compress_batch(texts)
+            comp_texts = dict(zip(texts, comp_texts))
+            comp_prompts = [comp_texts.get(text, text) for text in comp_prompts]
+        return comp_prompts
+
     
\ No newline at end of file
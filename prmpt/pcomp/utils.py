@@ -1,4 +1,8 @@
-from typing import Any, Callable, List, Tuple
+import re
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from prmpt.utils import content_texts, replace_content_texts
 
 class DotDict(dict):
     """
@@ -77,73 +81,190 @@ class ParseError(Exception):
         """
         return f"ParseError: {self.args[0]} in `Prompt`: {self.prompt}"
 
-def parse_protect_tags(prompt: str, protect_tag: str) -> Tuple[List[str], List[str]]:
+ProtectTag = Union[str, Sequence[str]]
+
+@lru_cache(maxsize=64)
+def protect_tag_pattern(protect_tags: Tuple[str, ...]) -> "re.Pattern":
     """
-    Parse the given prompt and extract protected chunks enclosed by protect tags.
+    Compiles the regex matching the start tags, end tags and self-closing markers of protect tags.
 
     Args:
-        prompt (str): The prompt string to parse.
-        protect_tag (str): The protect tag used to enclose the protected chunks.
+        protect_tags (Tuple[str, ...]): The protect tag names.
 
     Returns:
-        Tuple[List[str], List[str]]: A tuple containing two lists.
-            - The first list contains the chunks of the prompt that are not protected.
-            - The second list contains the protected chunks extracted from the prompt.
+        re.Pattern: The regex, with the `start`, `end` and `marker` groups.
+    """
+    names = "|".join(re.escape(tag) for tag in sorted(protect_tags, key=len, reverse=True))
+    return re.compile(f"<(?:/(?P<end>{names})|(?P<start>{names})(?P<marker>/)?)>")
 
-    Raises:
-        ParseError: If there are nested protect tags, an unclosed protect tag, or invalid protect tag sequences.
+def protect_tag_names(protect_tag: ProtectTag) -> Tuple[str, ...]:
+    """
+    Returns the protect tag names of a `protect_tag` argument, a tag name or a sequence of tag names.
     """
-    protect_start_tag = f"<{protect_tag}>"
-    protect_end_tag = f"</{protect_tag}>"
+    return (protect_tag,) if isinstance(protect_tag, str) else tuple(protect_tag)
 
-    chunks = []
-    protected_chunks = []
+def protect_spans(prompt: str, protect_tag: ProtectTag) -> List[Tuple[int, int, Optional[str]]]:
+    """
+    Scans the prompt once for protect tags and returns the offsets of its unprotected and protected
+    spans, without copying them. The spans alternate, starting and ending with an unprotected span, which
+    may be empty.
 
-    stack = []
-    start_idx = 0
+    Content enclosed by `<tag>` and `</tag>` is protected and the tags themselves are dropped. A
+    self-closing marker `<tag/>` is a protected span of its own, kept as it is. Inside a protected span
+    only its own `</tag>` and `<tag>` are parsed, the tags of other names are part of the protected text.
 
-    for i in range(len(prompt)):
-        if prompt[i : i + len(protect_start_tag)] == protect_start_tag:
-            if len(stack) != 0:  # nested ignore tags make no sense
-                raise ParseError("Nested ignore tags not allowed", prompt)
+    Args:
+        prompt (str): The prompt string to scan.
+        protect_tag (ProtectTag): The protect tag name, or a sequence of protect tag names.
 
-            stack.append(i)
-            chunks.append(prompt[start_idx:i])
+    Returns:
+        List[Tuple[int, int, Optional[str]]]: The (start, end, kind) of every span, where kind is `None` for unprotected spans and the tag name for protected spans.
 
-        elif prompt[i : i + len(protect_end_tag)] == protect_end_tag:
-            start_idx = i + len(protect_end_tag)
-            if len(stack) == 0:
+    Raises:
+        ParseError: If there are nested protect tags, an unclosed protect tag, or invalid protect tag sequences.
+    """
+    spans = []
+    start = 0
+    open_tag = None
+    open_end = 0
+
+    for match in protect_tag_pattern(protect_tag_names(protect_tag)).finditer(prompt):
+        end_tag = match["end"]
+        if open_tag is None:
+            if end_tag is not None:
                 raise ParseError(
-                    f"Invalid protect tag sequence. {protect_end_tag} must follow an unclosed {protect_start_tag}",
+                    f"Invalid protect tag sequence. </{end_tag}> must follow an unclosed <{end_tag}>",
                     prompt,
                 )
+            spans.append((start, match.start(), None))
+            if match["marker"]:
+                spans.append((match.start(), match.end(), match["start"]))
+                start = match.end()
+            else:
+                open_tag, open_end = match["start"], match.end()
+
+        elif match["start"] == open_tag and not match["marker"]:  # nested ignore tags make no sense
+            raise ParseError("Nested ignore tags not allowed", prompt)
 
-            protect_start_index = stack.pop()
-            protect_content = prompt[protect_start_index + len(protect_start_tag) : i]
-            protected_chunks.append(protect_content)
+        elif end_tag != open_tag:  # tags of other names are protected text
+            continue
 
-            if protect_content.startswith(
-                protect_start_tag
-            ) or protect_content.endswith(protect_end_tag):
-                raise ParseError("Invalid protect tag sequence.", prompt)
+        else:
+            spans.append((open_end, match.start(), open_tag))
+            open_tag = None
+            start = match.end()
 
-    if len(stack) > 0:
+    if open_tag is not None:
         raise ParseError(
-            f"All {protect_start_tag} must be followed by a corresponding {protect_end_tag}",
+            f"All <{open_tag}> must be followed by a corresponding </{open_tag}>",
             prompt,
         )
 
-    chunks.append(prompt[start_idx:])
-    assert (
-        len(chunks) == len(protected_chunks) + 1
-    ), f"Invalid tag parsing for string: {prompt}"
+    spans.append((start, len(prompt), None))
+    return spans
+
+def parse_protect_tags(prompt: str, protect_tag: ProtectTag) -> Tuple[List[str], List[str]]:
+    """
+    Parse the given prompt and extract protected chunks enclosed by protect tags, see `protect_spans`.
+
+    Args:
+        prompt (str): The prompt string to parse.
+        protect_tag (ProtectTag): The protect tag used to enclose the protected chunks, or a sequence of protect tags.
 
+    Returns:
+        Tuple[List[str], List[str]]: A tuple containing two lists.
+            - The first list contains the chunks of the prompt that are not protected.
+            - The second list contains the protected chunks extracted from the prompt.
+
+    Raises:
+        ParseError: If there are nested protect tags, an unclosed protect tag, or invalid protect tag sequences.
+    """
+    spans = protect_spans(prompt, protect_tag)
+    chunks = [prompt[start:end] for start, end, _ in spans[::2]]
+    protected_chunks = [prompt[start:end] for start, end, _ in spans[1::2]]
     return chunks, protected_chunks
 
+def stream_protect_tags(
+    chunks: Iterable[str], protect_tag: Optional[ProtectTag]
+) -> Iterator[Tuple[str, bool]]:
+    """
+    Incremental counterpart of `protect_spans`: splits text arriving in chunks into protected and
+    unprotected pieces as it arrives, holding back only the end of a chunk that may be the beginning of a
+    tag. Consecutive pieces can have the same protection, the tags themselves are dropped. Every closing
+    tag yields a protected piece, empty for an empty span, so the unprotected text on its two sides is
+    never merged.
+
+    Args:
+        chunks (Iterable[str]): The text chunks.
+        protect_tag (Optional[ProtectTag]): The protect tag name or names, `None` if nothing is protected.
+
+    Yields:
+        Tuple[str, bool]: The text pieces in order, with `True` for protected pieces.
+
+    Raises:
+        ParseError: If there are nested protect tags, an unclosed protect tag, or invalid protect tag sequences.
+    """
+    if protect_tag is None:
+        for chunk in chunks:
+            if len(chunk):
+                yield chunk, False
+        return
+
+    names = protect_tag_names(protect_tag)
+    pattern = protect_tag_pattern(names)
+    tags = [tag for name in names for tag in (f"<{name}>", f"</{name}>", f"<{name}/>")]
+
+    buffer = ""
+    open_tag = None
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        for match in pattern.finditer(buffer):
+            end_tag = match["end"]
+            if open_tag is None:
+                if end_tag is not None:
+                    raise ParseError(
+                        f"Invalid protect tag sequence. </{end_tag}> must follow an unclosed <{end_tag}>",
+                        buffer,
+                    )
+                if match.start() > pos:
+                    yield buffer[pos : match.start()], False
+                if match["marker"]:
+                    yield match[0], True
+                else:
+                    open_tag = match["start"]
+                pos = match.end()
+            elif match["start"] == open_tag and not match["marker"]:
+                raise ParseError("Nested ignore tags not allowed", buffer)
+            elif end_tag != open_tag:
+                continue
+            else:
+                yield buffer[pos : match.start()], True
+                open_tag = None
+                pos = match.end()
+
+        buffer = buffer[pos:]
+        held = 0
+        k = buffer.rfind("<")
+        if k != -1 and any(tag.startswith(buffer[k:]) for tag in tags):
+            held = len(buffer) - k
+        if len(buffer) > held:
+            yield buffer[: len(buffer) - held], open_tag is not None
+            buffer = buffer[len(buffer) - held :]
+
+    if open_tag is not None:
+        raise ParseError(
+            f"All <{open_tag}> must be followed by a corresponding </{open_tag}>",
+            buffer,
+        )
+    if buffer:
+        yield buffer, False
+
 def protected_runner(run: Callable) -> Callable:
     """
     Decorator function that runs the provided 'run' function in chunks for a given object and prompt.
-    It extracts protected chunks from the prompt and runs the 'run' function on each non-protected chunk.
+    It extracts protected chunks from the prompt and runs the 'run' function on each non-protected chunk,
+    through the object's `result_cache` if it has one.
 
     Args:
         run (Callable): The function to run on each non-protected chunk.
@@ -161,27 +282,93 @@ def protected_runner(run: Callable) -> Callable:
         compressed_result = my_run_function(my_obj, my_prompt, my_args, my_kwargs)
     """
 
+    def run_chunk(obj: object, chunk: str, *args, **kwargs) -> str:
+        result_cache = getattr(obj, "result_cache", None)
+        if result_cache is None:
+            return run(obj, chunk, *args, **kwargs)
+        return result_cache.map(
+            obj.fingerprint(),
+            [chunk],
+            lambda texts: [run(obj, text, *args, **kwargs) for text in texts],
+        )[0]
+
     def run_in_chunks(obj: object, prompt: str, *args, **kwargs) -> str:
         protect_tag = obj.protect_tag
-        comp_prompt = ""
 
-        if protect_tag is not None:
-            chunks, protected_chunks = parse_protect_tags(prompt, protect_tag)
-            protected_chunks.append("")
+        if protect_tag is None:
+            return run_chunk(obj, prompt, *args, **kwargs) if len(prompt) else prompt
 
-            for i, chunk in enumerate(chunks):
-                if len(chunk):
-                    comp_chunk = run(obj, chunk, *args, **kwargs)
-                else:
-                    comp_chunk = ""
-                comp_prompt += comp_chunk + protected_chunks[i]
+        comp_parts = []
+        for start, end, kind in protect_spans(prompt, protect_tag):
+            if start == end:
+                continue
+            chunk = prompt[start:end]
+            comp_parts.append(chunk if kind is not None else run_chunk(obj, chunk, *args, **kwargs))
+        return "".join(comp_parts)
 
-        elif len(prompt):
-            comp_prompt = run(obj, prompt, *args, **kwargs)
+    return run_in_chunks
 
-        else:
-            comp_prompt = prompt
+def protected_batch_runner(run_batch: Callable) -> Callable:
+    """
+    Decorator function that runs the provided 'run_batch' function once over the non-protected chunks
+    of a list of prompts. It is the batched counterpart of `protected_runner`: all non-empty chunks of
+    all prompts are collected into a single list, compressed with one call and mapped back in order.
+    With a `result_cache` on the object, only the chunks missing from the cache are compressed.
+
+    Args:
+        run_batch (Callable): The function to run on the list of all non-protected chunks.
+
+    Returns:
+        Callable: A wrapper function that performs the batched chunked execution of the 'run_batch' function.
+
+    Example:
+        @protected_batch_runner
+        def my_run_batch_function(obj, prompts, *args, **kwargs):
+            # Perform some operations on all prompts at once
+            return compressed_prompts
 
-        return comp_prompt
+        # Usage
+        compressed_results = my_run_batch_function(my_obj, my_prompts, my_args, my_kwargs)
+    """
+
+    def run_in_chunks(obj: object, prompts: List[str], *args, **kwargs) -> List[str]:
+        protect_tag = obj.protect_tag
+
+        parsed = []
+        flat_chunks = []
+        for prompt in prompts:
+            if protect_tag is not None:
+                spans = protect_spans(prompt, protect_tag)
+            else:
+                spans = [(0, len(prompt), None)]
+            parsed.append((prompt, spans))
+            flat_chunks.extend(
+                prompt[start:end] for start, end, kind in spans if kind is None and start != end
+            )
+
+        result_cache = getattr(obj, "result_cache", None)
+        if not flat_chunks:
+            flat_comp_chunks = iter([])
+        elif result_cache is None:
+            flat_comp_chunks = iter(run_batch(obj, flat_chunks, *args, **kwargs))
+        else:
+            flat_comp_chunks = iter(
+                result_cache.map(
+                    obj.fingerprint(),
+                    flat_chunks,
+                    lambda texts: run_batch(obj, texts, *args, **kwargs),
+                )
+            )
+
+        comp_prompts = []
+        for prompt, spans in parsed:
+            comp_parts = []
+            for start, end, kind in spans:
+                if start == end:
+                    continue
+                comp_parts.append(prompt[start:end] if kind is not None else next(flat_comp_chunks))
+            comp_prompts.append("".join(comp_parts))
+
+        return comp_prompts
 
     return run_in_chunks
\ No newline at end of file
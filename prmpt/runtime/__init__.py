@@ -0,0 +1,12 @@
+from prmpt.runtime.backends import BACKENDS, OnnxModel, load_model
+from prmpt.runtime.pool import ExecutionPool
+from prmpt.runtime.registry import ModelRegistry, registry
+
+__all__ = [
+    "BACKENDS",
+    "OnnxModel",
+    "load_model",
+    "ExecutionPool",
+    "ModelRegistry",
+    "registry",
+]
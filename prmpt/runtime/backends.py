@@ -0,0 +1,226 @@
+import inspect
+import os
+import re
+from types import SimpleNamespace
+from typing import Optional, Sequence
+
+import torch
+from transformers import AutoConfig
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "prmpt", "backends")
+
+def artifact_path(
+    model_name: str,
+    model_class: type,
+    suffix: str,
+    cache_dir: Optional[str] = None,
+    **model_kwargs,
+) -> str:
+    """
+    Returns the on-disk location of a converted model artifact.
+
+    Args:
+        model_name (str): The name or local path of the pretrained model.
+        model_class (type): The `transformers` auto class used to load the model.
+        suffix (str): The file suffix identifying the artifact type, e.g. `"int8.pt"` or `"onnx"`.
+        cache_dir (str, optional): The artifact directory. Defaults to `~/.cache/prmpt/backends`.
+        **model_kwargs: The keyword arguments the model is loaded with.
+
+    Returns:
+        str: The artifact path.
+    """
+    cache_dir = os.path.expanduser(cache_dir or DEFAULT_CACHE_DIR)
+    slug = re.sub(r"[^\w.-]+", "--", model_name).strip("-")
+    name = "-".join(
+        [model_class.__name__] + [f"{k}={v}" for k, v in sorted(model_kwargs.items())]
+    )
+    return os.path.join(cache_dir, slug, f"{name}.{suffix}")
+
+class OnnxModel:
+    """
+    OnnxModel wraps an ONNX Runtime inference session exported from a `transformers` model, so it can be
+    called like the eager model it replaces: `model(input_ids, attention_mask=...)` returns an object with
+    the exported outputs (`logits`, `hidden_states`...) as torch tensors.
+    """
+
+    def __init__(self, path: str, config, output_names: Sequence[str]):
+        """
+        Initializes the OnnxModel.
+
+        Args:
+            path (str): The path of the ONNX graph.
+            config: The `transformers` config of the exported model.
+            output_names (Sequence[str]): The names of the graph outputs.
+        """
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError(
+                "The `onnx` backend requires `onnxruntime`. Install it with `pip install onnxruntime`."
+            ) from e
+
+        self.config = config
+        self.output_names = list(output_names)
+        self.session = onnxruntime.InferenceSession(
+            path, providers=["CPUExecutionProvider"]
+        )
+
+    def __call__(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: Optional[torch.Tensor] = None,
+        **kwargs,
+    ) -> SimpleNamespace:
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        outputs = self.session.run(
+            self.output_names,
+            {
+                "input_ids": input_ids.cpu().numpy(),
+                "attention_mask": attention_mask.cpu().numpy(),
+            },
+        )
+        outputs = {
+            name: torch.from_numpy(output)
+            for name, output in zip(self.output_names, outputs)
+        }
+        if "hidden_states" in outputs:
+            outputs["hidden_states"] = tuple(outputs["hidden_states"].unbind(0))
+        return SimpleNamespace(**outputs)
+
+    def to(self, device: torch.device) -> "OnnxModel":
+        return self
+
+    def eval(self) -> "OnnxModel":
+        return self
+
+class _ExportWrapper(torch.nn.Module):
+    def __init__(self, model: torch.nn.Module, output_names: Sequence[str]):
+        super().__init__()
+        self.model = model
+        self.output_names = list(output_names)
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor):
+        outputs = self.model(
+            input_ids,
+            attention_mask=attention_mask,
+            output_hidden_states="hidden_states" in self.output_names,
+        )
+        return tuple(
+            torch.stack(outputs.hidden_states) if name == "hidden_states" else outputs[name]
+            for name in self.output_names
+        )
+
+def export_onnx(model: torch.nn.Module, path: str, output_names: Sequence[str]) -> None:
+    """
+    Exports a `transformers` model to an ONNX graph with dynamic batch and sequence axes.
+
+    Args:
+        model (torch.nn.Module): The eager model.
+        path (str): The path of the ONNX graph to write.
+        output_names (Sequence[str]): The model outputs to export.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    dummy = torch.ones((2, 8), dtype=torch.long)
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+    }
+    for name in output_names:
+        dynamic_axes[name] = (
+            {1: "batch", 2: "sequence"} if name == "hidden_states" else {0: "batch", 1: "sequence"}
+        )
+
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+
+    tmp_path = f"{path}.tmp"
+    torch.onnx.export(
+        _ExportWrapper(model, output_names).eval(),
+        (dummy, dummy),
+        tmp_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=list(output_names),
+        dynamic_axes=dynamic_axes,
+        opset_version=14,
+        **export_kwargs,
+    )
+    os.replace(tmp_path, path)
+
+def _load_config(model_name: str, **model_kwargs):
+    return AutoConfig.from_pretrained(model_name, **model_kwargs)
+
+def _from_config(model_class: type, config) -> torch.nn.Module:
+    if hasattr(model_class, "from_config"):
+        return model_class.from_config(config)
+    return model_class(config)
+
+def _quantize(model: torch.nn.Module) -> torch.nn.Module:
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+def load_model(
+    model_name: str,
+    model_class: type,
+    backend: str = "torch",
+    cache_dir: Optional[str] = None,
+    output_names: Sequence[str] = ("logits",),
+    **model_kwargs,
+):
+    """
+    Loads a `transformers` model for inference with the given backend.
+
+    - `"torch"`: the eager PyTorch model.
+    - `"torch-int8"`: the eager model with its linear layers dynamically quantized to int8. The quantized
+      weights are cached on disk and reloaded without quantizing again.
+    - `"onnx"`: an ONNX Runtime session. The model is exported to ONNX once and the graph is cached on disk.
+
+    The converted backends run on CPU.
+
+    Args:
+        model_name (str): The name or local path of the pretrained model.
+        model_class (type): The `transformers` auto class used to load the model, e.g. `AutoModelForMaskedLM`.
+        backend (str, optional): One of `"torch"`, `"torch-int8"` or `"onnx"`. Defaults to `"torch"`.
+        cache_dir (str, optional): The directory of the converted artifacts. Defaults to `~/.cache/prmpt/backends`.
+        output_names (Sequence[str], optional): The model outputs exported to ONNX. Defaults to `("logits",)`.
+        **model_kwargs: Additional keyword arguments for `from_pretrained`.
+
+    Returns:
+        The model, in evaluation mode.
+
+    Raises:
+        AssertionError: If the backend is not supported.
+    """
+    assert backend in BACKENDS, f"Backend `{backend}` not implemented. Choose one of: {BACKENDS}"
+
+    if backend == "torch":
+        return model_class.from_pretrained(model_name, **model_kwargs).eval()
+
+    if backend == "torch-int8":
+        path = artifact_path(
+            model_name, model_class, "int8.pt", cache_dir, **model_kwargs
+        )
+        if os.path.exists(path):
+            config = _load_config(model_name, **model_kwargs)
+            model = _quantize(_from_config(model_class, config).eval())
+            model.load_state_dict(torch.load(path))
+            return model
+
+        model = _quantize(model_class.from_pretrained(model_name, **model_kwargs).eval())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.save(model.state_dict(), f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        return model.eval()
+
+    suffix = "-".join(output_names) + ".onnx"
+    path = artifact_path(model_name, model_class, suffix, cache_dir, **model_kwargs)
+    if os.path.exists(path):
+        config = _load_config(model_name, **model_kwargs)
+    else:
+        model = model_class.from_pretrained(model_name, **model_kwargs).eval()
+        config = model.config
+        export_onnx(model, path, output_names)
+    return OnnxModel(path, config, output_names)
@@ -0,0 +1,160 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Iterable, List, Optional
+
+import torch
+
+class ExecutionPool:
+    """
+    ExecutionPool runs model inference on `replicas` worker threads, each using `threads_per_replica`
+    intra-op threads, so concurrent requests neither oversubscribe the cores nor queue behind one
+    another. Tasks go to whichever replica is free first and run under `torch.inference_mode`.
+
+    Replicas share the model weights: inference only reads them, so memory does not grow with the
+    number of replicas. With `pin_cores=True` each replica is pinned to its own set of cores (Linux only).
+
+    Example:
+        >>> from prmpt.pcomp import EntropyComp
+        >>> from prmpt.runtime import ExecutionPool
+        >>> pool = ExecutionPool(replicas=8, threads_per_replica=4, pin_cores=True)
+        >>> p_compressor = EntropyComp(p=0.1, pool=pool)
+        >>> res = p_compressor("example prompt...")
+        >>> pool.utilization()
+    """
+
+    def __init__(
+        self,
+        replicas: int = 1,
+        threads_per_replica: Optional[int] = None,
+        interop_threads: Optional[int] = None,
+        pin_cores: bool = False,
+    ):
+        """
+        Initializes the ExecutionPool and starts its worker threads.
+
+        Args:
+            replicas (int, optional): The number of worker threads running inference concurrently. Defaults to `1`.
+            threads_per_replica (int, optional): The number of torch intra-op threads used by each replica. Defaults to `None` i.e. the available cores divided by `replicas`.
+            interop_threads (int, optional): The number of torch inter-op threads. It can only be set before the first parallel torch operation of the process. Defaults to `None` i.e. torch default.
+            pin_cores (bool, optional): Whether to pin each replica to its own set of `threads_per_replica` cores. Defaults to False.
+        """
+        cores = (
+            sorted(os.sched_getaffinity(0))
+            if hasattr(os, "sched_getaffinity")
+            else list(range(os.cpu_count() or 1))
+        )
+        self.replicas = replicas
+        self.threads_per_replica = threads_per_replica or max(1, len(cores) // replicas)
+        if interop_threads is not None:
+            try:
+                torch.set_num_interop_threads(interop_threads)
+            except RuntimeError:
+                pass
+
+        self._tasks = queue.Queue()
+        self._busy = [0.0] * replicas
+        self._n_tasks = [0] * replicas
+        self._started = time.perf_counter()
+        self._workers = []
+        for replica in range(replicas):
+            replica_cores = None
+            if pin_cores and hasattr(os, "sched_setaffinity"):
+                start = replica * self.threads_per_replica
+                replica_cores = cores[start : start + self.threads_per_replica] or None
+            worker = threading.Thread(
+                target=self._work,
+                args=(replica, replica_cores),
+                name=f"prmpt-replica-{replica}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self, replica: int, cores: Optional[List[int]]) -> None:
+        if cores is not None:
+            os.sched_setaffinity(0, cores)
+        torch.set_num_threads(self.threads_per_replica)
+
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            start = time.perf_counter()
+            try:
+                with torch.inference_mode():
+                    future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._busy[replica] += time.perf_counter() - start
+                self._n_tasks[replica] += 1
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Schedules `fn(*args, **kwargs)` on the first free replica.
+
+        Args:
+            fn (Callable): The function to run.
+            *args: Positional arguments for `fn`.
+            **kwargs: Keyword arguments for `fn`.
+
+        Returns:
+            Future: The future of the result.
+        """
+        future = Future()
+        self._tasks.put((future, fn, args, kwargs))
+        return future
+
+    def map(self, fn: Callable, iterable: Iterable) -> List[Any]:
+        """
+        Runs `fn` on every item across the replicas.
+
+        Args:
+            fn (Callable): The function to run.
+            iterable (Iterable): The items.
+
+        Returns:
+            List[Any]: The results, in the order of the items.
+        """
+        futures = [self.submit(fn, item) for item in iterable]
+        return [future.result() for future in futures]
+
+    def utilization(self) -> dict:
+        """
+        Reports how busy each replica has been since the pool started.
+
+        Returns:
+            dict: The fraction of wall time each replica spent running tasks, the number of tasks each ran, and the number of queued tasks.
+        """
+        elapsed = time.perf_counter() - self._started
+        busy = [b / elapsed for b in self._busy] if elapsed > 0 else [0.0] * self.replicas
+        return {
+            "replicas": self.replicas,
+            "threads_per_replica": self.threads_per_replica,
+            "busy": busy,
+            "mean_busy": sum(busy) / self.replicas,
+            "tasks": list(self._n_tasks),
+            "queued": self._tasks.qsize(),
+        }
+
+    def close(self) -> None:
+        """
+        Stops the worker threads once the queued tasks are done.
+        """
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self) -> "ExecutionPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
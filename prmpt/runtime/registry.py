@@ -0,0 +1,146 @@
+import gc
+import threading
+from typing import Optional
+
+import torch
+from transformers import AutoTokenizer
+
+from prmpt.runtime.backends import load_model
+
+class ModelRegistry:
+    """
+    ModelRegistry is a process-wide store of loaded models and tokenizers. Models are keyed by
+    `(model_name, model class, device, dtype, backend, load arguments)`, loaded on first use and shared by
+    every compressor and metric asking for the same key, so a pipeline loads each set of weights only once.
+
+    Example:
+        >>> from prmpt.runtime import registry
+        >>> model = registry.get("bert-base-cased", AutoModelForMaskedLM)
+        >>> registry.release("bert-base-cased")
+    """
+
+    def __init__(self):
+        """
+        Initializes the ModelRegistry.
+        """
+        self._models = {}
+        self._tokenizers = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(
+        self,
+        model_name: str,
+        model_class: type,
+        device: Optional[torch.device] = None,
+        dtype: Optional[torch.dtype] = None,
+        backend: str = "torch",
+        cache_dir: Optional[str] = None,
+        **model_kwargs,
+    ):
+        """
+        Returns the model for the given key, loading it on first use.
+
+        Args:
+            model_name (str): The name or local path of the pretrained model.
+            model_class (type): The `transformers` auto class used to load the model.
+            device (torch.device, optional): The device to place the model on. Defaults to `None` i.e. CPU.
+            dtype (torch.dtype, optional): The dtype to cast the model weights to. Defaults to `None` i.e. as stored.
+            backend (str, optional): The inference backend, see `prmpt.runtime.load_model`. Defaults to `"torch"`.
+            cache_dir (str, optional): The directory of converted backend artifacts. Defaults to `None`.
+            **model_kwargs: Additional keyword arguments for `load_model`.
+
+        Returns:
+            The shared model, in evaluation mode.
+        """
+        device = torch.device(device or "cpu")
+        key = (
+            model_name,
+            model_class.__name__,
+            str(device),
+            str(dtype),
+            backend,
+            tuple(sorted((k, str(v)) for k, v in model_kwargs.items())),
+        )
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._key_lock(key):
+            model = self._models.get(key)
+            if model is None:
+                model = load_model(
+                    model_name,
+                    model_class,
+                    backend=backend,
+                    cache_dir=cache_dir,
+                    **model_kwargs,
+                )
+                model = model.to(device)
+                if dtype is not None:
+                    model = model.to(dtype)
+                self._models[key] = model
+        return model
+
+    def get_tokenizer(self, model_name: str):
+        """
+        Returns the tokenizer of a model, loading it on first use.
+
+        Args:
+            model_name (str): The name or local path of the pretrained model.
+
+        Returns:
+            The shared tokenizer.
+        """
+        tokenizer = self._tokenizers.get(model_name)
+        if tokenizer is not None:
+            return tokenizer
+
+        with self._key_lock(("tokenizer", model_name)):
+            tokenizer = self._tokenizers.get(model_name)
+            if tokenizer is None:
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+                self._tokenizers[model_name] = tokenizer
+        return tokenizer
+
+    def loaded(self) -> list:
+        """
+        Returns the keys of the loaded models.
+
+        Returns:
+            list: The `(model_name, model class, device, dtype, backend, load arguments)` key of each loaded model.
+        """
+        return list(self._models)
+
+    def release(self, model_name: Optional[str] = None) -> int:
+        """
+        Drops the registry references to loaded models and tokenizers so their memory can be reclaimed.
+        Objects still holding a model keep it alive until they release it too.
+
+        Args:
+            model_name (str, optional): Only release the models and tokenizer of this model. Defaults to `None` i.e. release everything.
+
+        Returns:
+            int: The number of released models.
+        """
+        with self._lock:
+            keys = [
+                key for key in self._models if model_name is None or key[0] == model_name
+            ]
+            for key in keys:
+                del self._models[key]
+            if model_name is None:
+                self._tokenizers.clear()
+            else:
+                self._tokenizers.pop(model_name, None)
+
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return len(keys)
+
+registry = ModelRegistry()
@@ -0,0 +1,47 @@
+from typing import List, Union
+
+def content_texts(content: Union[str, list]) -> List[str]:
+    """
+    Returns the texts of chat message content: the content itself if it is a string, or the text parts
+    of a list of content parts (e.g. `{"type": "text", "text": ...}` next to image parts).
+
+    Args:
+        content (Union[str, list]): The message content.
+
+    Returns:
+        List[str]: The texts.
+    """
+    if isinstance(content, str):
+        return [content]
+    return [
+        part if isinstance(part, str) else part["text"]
+        for part in content
+        if isinstance(part, str) or (isinstance(part, dict) and part.get("type") == "text")
+    ]
+
+def replace_content_texts(content: Union[str, list], texts: List[str]) -> Union[str, list]:
+    """
+    Replaces the texts of chat message content, see `content_texts`. Parts whose text is unchanged and
+    non-text parts are shared with `content`, not copied.
+
+    Args:
+        content (Union[str, list]): The message content.
+        texts (List[str]): The new texts, in order.
+
+    Returns:
+        Union[str, list]: The new message content.
+    """
+    if isinstance(content, str):
+        return texts[0]
+
+    texts = iter(texts)
+    comp_content = []
+    for part in content:
+        if isinstance(part, str):
+            part = next(texts)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            text = next(texts)
+            if text != part["text"]:
+                part = {**part, "text": text}
+        comp_content.append(part)
+    return comp_content
@@ -1,6 +1,6 @@
 from tests.unit_tests import utils
 from prmpt.metric import BERTMetric, TokenMetric
-from prmpt.pcomp import AutocorrectComp
+from prmpt.pcomp import AutocorrectComp, SpellerDictionary
 
 
 def test_autocorrect_comp():
@@ -9,4 +9,24 @@ def test_autocorrect_comp():
         verbose=True, metrics=[TokenMetric(), BERTMetric()]
     )
     compressed_prompt = p_compressor(prompt)
-    assert len(compressed_prompt) > 0, "Failed!"
\ No newline at end of file
+    assert len(compressed_prompt) > 0, "Failed!"
+
+def test_autocorrect_comp_memo():
+    prompt = utils.load_prompt("prompt1.txt") + " Teh quikc brwn fox jumpd ovr teh lazzy dog"
+    p_compressor = AutocorrectComp()
+    expected = " ".join(p_compressor.spell(word) for word in prompt.split())
+    assert p_compressor.compress(prompt) == expected, "Failed!"
+    misses = p_compressor.memo_stats()["misses"]
+    assert p_compressor.compress(prompt) == expected, "Failed!"
+    stats = p_compressor.memo_stats()
+    assert stats["known"] > 0 and stats["misses"] == misses > 0, "Failed!"
+
+
+def test_autocorrect_comp_dictionary_snapshot(tmp_path):
+    prompt = utils.load_prompt("prompt1.txt") + " Teh quikc brwn fox jumpd ovr teh lazzy dog"
+    dictionary_path = str(tmp_path / "en.spell")
+    expected = AutocorrectComp().compress(prompt)
+    assert AutocorrectComp(dictionary_path=dictionary_path).compress(prompt) == expected, "Failed!"
+    reloaded = AutocorrectComp(dictionary_path=dictionary_path)
+    assert isinstance(reloaded.spell.nlp_data, SpellerDictionary), "Failed!"
+    assert reloaded.compress(prompt) == expected, "Failed!"
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from tests.unit_tests import utils
+from prmpt.pcomp import EntropyComp
+
+
+def kept_tokens(p_compressor, prompt):
+    (_, entropies), = p_compressor.score_prompts([prompt])
+    return set(np.nonzero(entropies >= np.percentile(entropies, p_compressor.p))[0])
+
+
+@pytest.mark.parametrize("backend", ["torch-int8", "onnx"])
+def test_backend_parity(backend, tmp_path):
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    prompt = utils.load_prompt("prompt1.txt")
+    kept_eager = kept_tokens(EntropyComp(p=0.1), prompt)
+    kept_backend = kept_tokens(
+        EntropyComp(p=0.1, backend=backend, backend_cache_dir=str(tmp_path)), prompt
+    )
+    jaccard = len(kept_eager & kept_backend) / len(kept_eager | kept_backend)
+    assert jaccard >= 0.95, "Failed!"
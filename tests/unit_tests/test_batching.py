@@ -0,0 +1,56 @@
+import asyncio
+
+from prmpt.pcomp import PunctuationComp
+from prmpt.pcomp.batching import MicroBatcher
+
+
+def test_micro_batcher():
+    batch_sizes = []
+
+    def double(items):
+        batch_sizes.append(len(items))
+        return [2 * item for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    assert asyncio.run(main()) == [2 * i for i in range(10)], "Failed!"
+    assert max(batch_sizes) == 4 and sum(batch_sizes) == 10, "Failed!"
+
+
+def test_acall():
+    p_compressor = PunctuationComp()
+    messages = [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "Hello, world!"},
+    ]
+
+    async def main():
+        return await asyncio.gather(
+            p_compressor.acall("Hello, world!"),
+            p_compressor.acall(messages, json=True, skip_system=True),
+        )
+
+    res_str, res_json = asyncio.run(main())
+    assert res_str.content == "Hello world", "Failed!"
+    assert res_json.content == p_compressor(messages, json=True, skip_system=True).content, "Failed!"
+
+
+def test_acall_isolates_errors():
+    from prmpt.pcomp.utils import ParseError
+
+    p_compressor = PunctuationComp(protect_tag="keep")
+    p_compressor.configure_batching(max_batch_size=8, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(
+            p_compressor.acall("Bad, <keep>tag!"),
+            p_compressor.acall("Good, <keep>tag!</keep>"),
+            return_exceptions=True,
+        )
+
+    res_bad, res_good = asyncio.run(main())
+    assert isinstance(res_bad, ParseError), "Failed!"
+    assert res_good.content == "Good tag!", "Failed!"
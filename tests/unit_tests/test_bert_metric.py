@@ -0,0 +1,12 @@
+from tests.unit_tests import utils
+from prmpt.metric import BERTMetric
+
+
+def test_bert_metric_batch_run():
+    prompt = utils.load_prompt("prompt1.txt")
+    comp_prompt = prompt[: len(prompt) // 2]
+    metric = BERTMetric(batch_size=2)
+    res = metric.batch_run([prompt, "Hello there.", prompt], [comp_prompt, "Hello.", prompt])
+    assert 0 < res["bert_score_f1"] <= 1, "Failed!"
+    expected = metric.run(prompt, comp_prompt)["bert_score_precision"]
+    assert abs(metric.scores([(prompt, comp_prompt)])[0]["bert_score_precision"] - expected) < 1e-5, "Failed!"
@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from prmpt.pcomp import (
+    FusedRuleComp,
+    MemoryCache,
+    PunctuationComp,
+    ResultCache,
+    SQLiteCache,
+    SurprisalCache,
+)
+
+
+def test_memory_cache_eviction():
+    cache = MemoryCache(max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    assert cache.get("a") == b"12345", "Failed!"
+    cache.set("c", b"12345")
+    assert cache.get("b") is None, "Failed!"
+    assert cache.get("a") is not None and cache.nbytes == 10, "Failed!"
+
+
+def test_sqlite_cache_persistence(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SQLiteCache(path, max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    cache.set("c", b"12345")
+    reopened = SQLiteCache(path, max_bytes=10)
+    assert len(reopened) == 2 and reopened.get("c") == b"12345", "Failed!"
+
+
+def test_surprisal_cache_stats(tmp_path):
+    cache = SurprisalCache(path=str(tmp_path / "cache.sqlite"))
+    assert cache.get("model", [1, 2, 3]) is None, "Failed!"
+    cache.set("model", [1, 2, 3], np.array([0.5, 1.0, 2.0]))
+    assert np.allclose(cache.get("model", [1, 2, 3]), [0.5, 1.0, 2.0]), "Failed!"
+    assert cache.get("other-model", [1, 2, 3]) is None, "Failed!"
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2, "Failed!"
+
+
+def test_result_cache(tmp_path):
+    prompt = "Hello, world! <keep>Keep, this!</keep> Bye, now."
+    result_cache = ResultCache(SQLiteCache(str(tmp_path / "results.sqlite")))
+    p_compressor = PunctuationComp(protect_tag="keep", result_cache=result_cache)
+    comp_prompt = p_compressor.run(prompt)
+    assert p_compressor.run_batch([prompt, prompt]) == [comp_prompt] * 2, "Failed!"
+    assert result_cache.stats()["misses"] == 2, "Failed!"
+    assert result_cache.stats()["hits"] == 4, "Failed!"
+
+    other = FusedRuleComp(stopwords=["hello"], result_cache=result_cache)
+    assert other.fingerprint() != p_compressor.fingerprint(), "Failed!"
+    assert other.run("Hello, world!") == "world", "Failed!"
+
+
+def test_memory_cache_ttl():
+    cache = MemoryCache(ttl=0.0)
+    cache.set("a", b"12345")
+    assert cache.get("a") is None and cache.expirations == 1, "Failed!"
+
+
+FINGERPRINT_SCRIPT = """
+from prmpt.pcomp import FusedRuleComp, LemmaTable
+table = LemmaTable(frozenset(["ran", "cats"]), {("ran", "v"): "run", ("cats", "n"): "cat"})
+print(FusedRuleComp(stopwords=["the"]).fingerprint(), table.fingerprint())
+"""
+
+
+def test_fingerprint_across_processes():
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    outputs = [
+        subprocess.run(
+            [sys.executable, "-c", FINGERPRINT_SCRIPT],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        for _ in range(2)
+    ]
+    assert outputs[0] == outputs[1] and len(outputs[0].split()) == 2, "Failed!"
+
+
+def test_fingerprint_rejects_objects():
+    class ObjectComp(PunctuationComp):
+        def get_config(self):
+            return {**super().get_config(), "table": object()}
+
+    try:
+        ObjectComp().fingerprint()
+    except TypeError:
+        return
+    assert False, "Failed!"
+
+
+def test_sqlite_cache_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache1 = SQLiteCache(path, max_bytes=10)
+    cache2 = SQLiteCache(path, max_bytes=10)
+    cache1.set("a", b"12345")
+    cache2.set("b", b"12345")
+    cache1.set("c", b"12345")
+    assert cache1.nbytes == cache2.nbytes == 10 and len(cache2) == 2, "Failed!"
+    assert cache2.get("a") is None and cache2.get("c") == b"12345", "Failed!"
+
+
+def test_sqlite_cache_touch_interval(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SQLiteCache(path, max_bytes=10, touch_interval=3600)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    assert cache.get("a") == b"12345", "Failed!"
+    cache.set("c", b"12345")
+    assert cache.get("a") is None and cache.get("b") == b"12345", "Failed!"
+    cache = SQLiteCache(path, max_bytes=10, touch_interval=0)
+    assert cache.get("b") == b"12345", "Failed!"
+    cache.set("d", b"12345")
+    assert cache.get("b") == b"12345" and cache.get("c") is None, "Failed!"
+
+
+def test_result_cache_repeated_misses():
+    result_cache = ResultCache()
+    texts = ["Hello, world!", "Hello, world!", "Bye, now."]
+    comp_texts = result_cache.map("fingerprint", texts, lambda batch: [t.upper() for t in batch])
+    assert comp_texts == [t.upper() for t in texts], "Failed!"
+    assert result_cache.stats()["hits"] == 0 and result_cache.stats()["misses"] == 3, "Failed!"
+    result_cache.map("fingerprint", texts[:2], lambda batch: [t.upper() for t in batch])
+    assert result_cache.stats()["hits"] == 2, "Failed!"
@@ -0,0 +1,36 @@
+from tests.unit_tests import utils
+from prmpt.metric import TokenMetric
+from prmpt.pcomp import CausalEntropyComp
+
+def test_causal_entropy_comp():
+    prompt = utils.load_prompt("prompt1.txt")
+    p_compressor = CausalEntropyComp(verbose=True, p=0.1, metrics=[TokenMetric()])
+    compressed_prompt = p_compressor(prompt)
+    assert len(compressed_prompt) > 0, "Failed!"
+
+def test_causal_entropy_comp_kv_reuse():
+    prompt = utils.load_prompt("prompt1.txt")
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt[:300]},
+        {"role": "assistant", "content": "The answer is A."},
+        {"role": "user", "content": prompt[300:]},
+    ]
+    p_compressor = CausalEntropyComp(p=0.1)
+    p_compressor(messages[:2], json=True)
+    reused = p_compressor(messages, json=True, skip_system=True)
+    fresh = CausalEntropyComp(p=0.1)(messages, json=True, skip_system=True)
+    assert reused.content == fresh.content, "Failed!"
+
+def test_causal_entropy_comp_conversation():
+    from prmpt.pcomp import ConversationCompressor
+
+    prompt = utils.load_prompt("prompt1.txt")
+    messages = [
+        {"role": "user", "content": prompt[:300]},
+        {"role": "assistant", "content": "The answer is A."},
+    ]
+    p_compressor = CausalEntropyComp(p=0.1)
+    compressed = ConversationCompressor(p_compressor)(messages).content
+    assert len(p_compressor.conversations) == 1, "Failed!"
+    assert compressed == CausalEntropyComp(p=0.1)(messages, json=True).content, "Failed!"
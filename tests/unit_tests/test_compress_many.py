@@ -0,0 +1,26 @@
+from tests.unit_tests import utils
+from prmpt.pcomp import FusedRuleComp, PunctuationComp, Sequential
+
+def test_compress_many():
+    prompt = utils.load_prompt("prompt1.txt")
+    prompts = [f"{prompt} Question {i}, answer: A." for i in range(20)]
+    p_compressor = Sequential(PunctuationComp(), FusedRuleComp(stopwords=["the"]))
+    expected = [p_compressor(prompt).content for prompt in prompts]
+    for executor in ["thread", "process"]:
+        comp_prompts = p_compressor.compress_many(
+            prompts, workers=2, executor=executor, chunksize=3
+        )
+        assert comp_prompts == expected, "Failed!"
+
+def test_compress_many_json():
+    prompt = utils.load_prompt("prompt1.txt")
+    chats = [
+        [{"role": "system", "content": "Be concise!"}, {"role": "user", "content": f"{prompt} {i}."}]
+        for i in range(6)
+    ]
+    p_compressor = PunctuationComp()
+    comp_chats = p_compressor.compress_many(
+        chats, workers=2, executor="process", chunksize=2, json=True, skip_system=True
+    )
+    assert [chat[0] for chat in comp_chats] == [chat[0] for chat in chats], "Failed!"
+    assert comp_chats[5][1]["content"] == PunctuationComp().compress(f"{prompt} 5."), "Failed!"
@@ -0,0 +1,63 @@
+from tests.unit_tests import utils
+from prmpt.pcomp import ConversationCompressor, PunctuationComp
+from prmpt.metric.base import Metric
+
+
+def test_conversation():
+    prompt = utils.load_prompt("prompt1.txt")
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+    conversation = ConversationCompressor(PunctuationComp(), skip_system=True)
+    first = conversation(messages).content
+    messages = messages + [
+        {"role": "assistant", "content": "Sure, here it is!"},
+        {"role": "user", "content": "Thanks, bye."},
+    ]
+    second = conversation(messages).content
+    assert second[:2] == first and second[1] is first[1], "Failed!"
+    assert second == PunctuationComp().run_json(messages, skip_system=True), "Failed!"
+    assert conversation.reused == 2 and conversation.compressed == 4, "Failed!"
+
+    messages[1] = {"role": "user", "content": "Edited, message."}
+    third = conversation(messages).content
+    assert third[1]["content"] == "Edited message" and len(conversation) == 4, "Failed!"
+    assert conversation.reused == 3, "Failed!"
+
+
+class LengthMetric(Metric):
+    def __init__(self):
+        super().__init__()
+        self.key = "length_ratio"
+        self.runs = 0
+
+    def run(self, prompt_before: str, prompt_after: str) -> dict:
+        self.runs += 1
+        return {self.key: len(prompt_after) / len(prompt_before)}
+
+
+def test_conversation_metrics():
+    prompt = utils.load_prompt("prompt1.txt")
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+    metric = LengthMetric()
+    conversation = ConversationCompressor(PunctuationComp(metrics=[metric]), skip_system=True)
+    conversation(messages)
+    messages = messages + [
+        {"role": "assistant", "content": "Sure, here it is!"},
+        {"role": "user", "content": "Thanks, bye."},
+    ]
+    res = conversation(messages)
+    assert metric.runs == 3, "Failed!"
+    expected = PunctuationComp(metrics=[LengthMetric()]).run_json(messages, skip_system=True)
+    expected = LengthMetric().batch_run(messages, expected, skip_system=True, json=True)
+    assert abs(res.metrics[0]["length_ratio"] - expected["length_ratio"]) < 1e-9, "Failed!"
+
+    messages[3] = {"role": "user", "content": "Edited, message."}
+    conversation(messages)
+    assert metric.runs == 5, "Failed!"
@@ -8,3 +8,116 @@ def test_entropy_comp():
     compressed_prompt = p_compressor(prompt)
     assert len(compressed_prompt) > 0, "Failed!"
 
+def test_entropy_comp_batch():
+    prompt = utils.load_prompt("prompt1.txt")
+    prompts = [prompt, prompt[:200], prompt[100:]]
+    p_compressor = EntropyComp(p=0.1, batch_size=2)
+    compressed_prompts = p_compressor.compress_batch(prompts)
+    assert compressed_prompts == [p_compressor.run_chunk(p) for p in prompts], "Failed!"
+
+def test_entropy_comp_long_prompt():
+    prompt = utils.load_prompt("prompt1.txt") * 20
+    p_compressor = EntropyComp(p=0.1, stride=256)
+    n_tokens = len(p_compressor.tokenizer.encode(prompt, add_special_tokens=False))
+    windows = p_compressor.token_windows(n_tokens)
+    assert len(windows) > 1 and windows[-1][1] == n_tokens, "Failed!"
+    compressed_prompt = p_compressor(prompt)
+    assert len(compressed_prompt.content) > 0, "Failed!"
+
+def test_entropy_comp_shared_model(monkeypatch):
+    from prmpt.pcomp import entropy_comp
+    from prmpt.runtime import ModelRegistry
+
+    registry = ModelRegistry()
+    monkeypatch.setattr(entropy_comp, "registry", registry)
+    p_compressor1 = EntropyComp(p=0.1)
+    p_compressor2 = EntropyComp(p=0.5)
+    assert p_compressor1.model is p_compressor2.model, "Failed!"
+    assert registry.release(p_compressor1.model_name) == 1, "Failed!"
+    assert all(key[0] != p_compressor1.model_name for key in registry.loaded()), "Failed!"
+
+def test_entropy_comp_target_tokens():
+    prompt = utils.load_prompt("prompt1.txt")
+    metric = TokenMetric()
+    p_compressor = EntropyComp(target_tokens=50)
+    compressed_prompt = p_compressor.compress(prompt)
+    assert 0 < len(metric.tokenizer.encode(compressed_prompt)) <= 50, "Failed!"
+
+def test_entropy_comp_stream():
+    prompt = utils.load_prompt("prompt1.txt") * 5
+    p_compressor = EntropyComp(p=0.1)
+    chunks = [prompt[i : i + 100] for i in range(0, len(prompt), 100)]
+    pieces = list(p_compressor.compress_stream(chunks, segment_chars=1000, context_chars=200))
+    assert len(pieces) > 1, "Failed!"
+    assert 0 < len("".join(pieces)) < len(prompt), "Failed!"
+
+def test_entropy_comp_protect_context():
+    prompt = f"{utils.load_prompt('prompt1.txt')} <keep>Keep, this!</keep> and the end."
+    p_compressor = EntropyComp(p=0.3, protect_tag="keep", protect_context=True)
+    compressed_prompt = p_compressor.run(prompt)
+    assert "Keep, this!" in compressed_prompt and "<keep>" not in compressed_prompt, "Failed!"
+    assert p_compressor.run_batch([prompt, ""]) == [compressed_prompt, ""], "Failed!"
+
+def test_entropy_comp_target_tokens_protected():
+    prompt = " ".join(
+        f"{utils.load_prompt('prompt1.txt')} <keep>Keep {i}!</keep>" for i in range(3)
+    )
+    metric = TokenMetric()
+    p_compressor = EntropyComp(target_tokens=50, protect_tag="keep")
+    compressed_prompt = p_compressor.run(prompt)
+    assert all(f"Keep {i}!" in compressed_prompt for i in range(3)), "Failed!"
+    assert len(metric.tokenizer.encode(compressed_prompt)) <= 50, "Failed!"
+
+def test_entropy_comp_pool():
+    import torch
+
+    from prmpt.runtime import ExecutionPool
+
+    prompt = utils.load_prompt("prompt1.txt") * 5
+    n_threads = torch.get_num_threads()
+    with ExecutionPool(replicas=2, threads_per_replica=1) as pool:
+        p_compressor = EntropyComp(p=0.1, window_size=128, batch_size=2, pool=pool)
+        compressed_prompt = p_compressor.compress(prompt)
+        assert sum(pool.utilization()["tasks"]) > 1, "Failed!"
+    assert torch.get_num_threads() == n_threads, "Failed!"
+    expected = EntropyComp(p=0.1, window_size=128, batch_size=2).compress(prompt)
+    assert compressed_prompt == expected, "Failed!"
+
+def test_entropy_comp_target_ratio():
+    prompt = utils.load_prompt("prompt1.txt")
+    metric = TokenMetric()
+    p_compressor = EntropyComp(target_ratio=0.5)
+    compressed_prompt = p_compressor.compress(prompt)
+    assert metric(prompt, compressed_prompt)[metric.key] >= 0.5, "Failed!"
+
+def test_entropy_comp_surprisals():
+    import numpy as np
+    import torch
+
+    generator = torch.Generator().manual_seed(0)
+    logits = torch.randn(2, 7, 50, generator=generator) * 5
+    input_ids = torch.randint(0, 50, (2, 7), generator=generator)
+    p_compressor = EntropyComp()
+    surprisals = p_compressor.surprisals(logits, input_ids)
+    probs = torch.softmax(logits.double(), dim=-1).gather(-1, input_ids.unsqueeze(-1)).squeeze(-1)
+    expected = -torch.log2(probs)
+    assert surprisals.shape == input_ids.shape, "Failed!"
+    assert np.allclose(surprisals.numpy(), expected.numpy(), atol=1e-4), "Failed!"
+    assert np.allclose(
+        p_compressor.surprisals(logits.to(torch.bfloat16), input_ids).numpy(),
+        -torch.log2(torch.softmax(logits.to(torch.bfloat16).double(), dim=-1))
+        .gather(-1, input_ids.unsqueeze(-1))
+        .squeeze(-1)
+        .numpy(),
+        atol=1e-4,
+    ), "Failed!"
+
+def test_entropy_comp_bfloat16():
+    import numpy as np
+
+    prompt = utils.load_prompt("prompt1.txt")
+    (token_ids, entropies), = EntropyComp().score_prompts([prompt])
+    (bf16_token_ids, bf16_entropies), = EntropyComp(compute_dtype="bfloat16").score_prompts([prompt])
+    assert (bf16_token_ids == token_ids).all() and np.isfinite(bf16_entropies).all(), "Failed!"
+    assert np.abs(bf16_entropies - entropies).mean() < 0.5, "Failed!"
+    assert np.corrcoef(bf16_entropies, entropies)[0, 1] > 0.99, "Failed!"
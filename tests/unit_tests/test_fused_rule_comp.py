@@ -0,0 +1,31 @@
+from tests.unit_tests import utils
+from prmpt.metric import TokenMetric
+from prmpt.pcomp import FusedRuleComp, PunctuationComp
+
+def test_fused_rule_comp():
+    prompt = utils.load_prompt("prompt1.txt")
+    p_compressor = FusedRuleComp(collapse_whitespace=False, verbose=True, metrics=[TokenMetric()])
+    compressed_prompt = p_compressor(prompt)
+    assert len(compressed_prompt) > 0, "Failed!"
+    assert p_compressor.compress(prompt) == PunctuationComp().compress(prompt), "Failed!"
+
+def test_fused_rule_comp_stream():
+    prompt = utils.load_prompt("prompt1.txt") + " You know, the answer is, basically, B."
+    p_compressor = FusedRuleComp(fillers=["you know", "basically"], stopwords=["the", "is"])
+    compressed_prompt = p_compressor.compress(prompt)
+    assert compressed_prompt.endswith("answer B"), "Failed!"
+    chunks = [prompt[i : i + 7] for i in range(0, len(prompt), 7)]
+    assert "".join(p_compressor.compress_stream(chunks)) == compressed_prompt, "Failed!"
+
+def test_fused_rule_comp_stream_protected():
+    prompt = " ".join(f"the answer is <keep>{i}, the end.</keep>" for i in range(10))
+    p_compressor = FusedRuleComp(stopwords=["the", "is"], protect_tag="keep")
+    chunks = [prompt[i : i + 5] for i in range(0, len(prompt), 5)]
+    assert "".join(p_compressor.compress_stream(chunks)) == p_compressor.run(prompt), "Failed!"
+
+def test_fused_rule_comp_stream_empty_protected():
+    prompt = "the<k></k>,is you"
+    p_compressor = FusedRuleComp(stopwords=["the", "is"], protect_tag="k")
+    for size in range(1, len(prompt) + 1):
+        chunks = [prompt[i : i + size] for i in range(0, len(prompt), size)]
+        assert "".join(p_compressor.compress_stream(chunks)) == p_compressor.run(prompt), "Failed!"
@@ -1,9 +1,32 @@
 from tests.unit_tests import utils
 from prmpt.metric import TokenMetric
-from prmpt.pcomp import LemmatizerComp
+from prmpt.pcomp import LemmaTable, LemmatizerComp
 
 def test_punctuation_comp():
     prompt = utils.load_prompt("prompt1.txt")
     p_compressor = LemmatizerComp(verbose=True, metrics=[TokenMetric()])
     compressed_prompt = p_compressor(prompt)
     assert len(compressed_prompt) > 0, "Failed!"
+
+def test_lemmatizer_comp_memo(tmp_path):
+    prompt = utils.load_prompt("prompt1.txt")
+    memo_path = str(tmp_path / "lemmas.json")
+    p_compressor = LemmatizerComp(memo_path=memo_path)
+    compressed_prompt = p_compressor.compress(prompt)
+    assert p_compressor.memo_stats()["hits"] > 0, "Failed!"
+    p_compressor.save_memo()
+    reloaded = LemmatizerComp(memo_path=memo_path)
+    assert reloaded.compress(prompt) == compressed_prompt, "Failed!"
+    assert reloaded.memo_stats()["misses"] == 0, "Failed!"
+
+def test_lemmatizer_comp_lemma_table(tmp_path):
+    prompt = utils.load_prompt("prompt1.txt")
+    p_compressor = LemmatizerComp()
+    compressed_prompt = p_compressor.compress(prompt)
+    table_path = str(tmp_path / "lemmas.pkl")
+    LemmaTable.build(prompt.split()).save(table_path)
+    offline = LemmatizerComp(offline=True, lemma_table=table_path)
+    assert offline.compress(prompt) == compressed_prompt, "Failed!"
+    assert offline.lemmatizer is None, "Failed!"
+    reloaded = LemmatizerComp(offline=True, lemma_table=LemmaTable.load(table_path))
+    assert reloaded.fingerprint() == offline.fingerprint(), "Failed!"
@@ -0,0 +1,17 @@
+import pytest
+
+from prmpt.runtime import ExecutionPool
+
+
+def test_execution_pool_map():
+    with ExecutionPool(replicas=2, threads_per_replica=1) as pool:
+        assert pool.map(lambda x: x * x, range(10)) == [x * x for x in range(10)], "Failed!"
+        utilization = pool.utilization()
+    assert sum(utilization["tasks"]) == 10 and len(utilization["busy"]) == 2, "Failed!"
+
+
+def test_execution_pool_exception():
+    with ExecutionPool(replicas=1, threads_per_replica=1) as pool:
+        future = pool.submit(lambda: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            future.result()
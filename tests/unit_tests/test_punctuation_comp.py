@@ -1,9 +1,55 @@
+import pytest
+
 from tests.unit_tests import utils
 from prmpt.metric import TokenMetric
 from prmpt.pcomp import PunctuationComp
+from prmpt.pcomp.utils import ParseError
 
 def test_punctuation_comp():
     prompt = utils.load_prompt("prompt1.txt")
     p_compressor = PunctuationComp(verbose=True, metrics=[TokenMetric()])
     compressed_prompt = p_compressor(prompt)
     assert len(compressed_prompt) > 0, "Failed!"
+
+def test_punctuation_comp_copy_on_write():
+    image = {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}}
+    messages = [
+        {"role": "system", "content": "Be concise."},
+        {"role": "user", "content": [{"type": "text", "text": "Hello, world!"}, image]},
+        {"role": "assistant", "content": "ok"},
+    ]
+    p_compressor = PunctuationComp()
+    comp_messages = p_compressor(messages, json=True, skip_system=True).content
+    assert comp_messages[0] is messages[0] and comp_messages[2] is messages[2], "Failed!"
+    assert comp_messages[1]["content"][0]["text"] == "Hello world", "Failed!"
+    assert comp_messages[1]["content"][1] is image, "Failed!"
+    assert messages[1]["content"][0]["text"] == "Hello, world!", "Failed!"
+
+def test_punctuation_comp_stream():
+    prompt = "\n".join(
+        f"{utils.load_prompt('prompt1.txt')} <keep>Keep, {i}!</keep>" for i in range(10)
+    )
+    p_compressor = PunctuationComp(protect_tag="keep")
+    chunks = [prompt[i : i + 7] for i in range(0, len(prompt), 7)]
+    pieces = list(p_compressor.compress_stream(chunks, segment_chars=500, context_chars=100))
+    assert "".join(pieces) == p_compressor.run(prompt), "Failed!"
+
+
+def test_punctuation_comp_protect_tags():
+    prompt = "Hi, <keep>Keep, this!</keep> and <tool>Tool, output.</tool> <image/> end."
+    p_compressor = PunctuationComp(protect_tag=["keep", "tool", "image"])
+    comp_prompt = "Hi Keep, this! and Tool, output. <image/> end"
+    assert p_compressor.run(prompt) == comp_prompt, "Failed!"
+    assert p_compressor.run_batch([prompt, ""]) == [comp_prompt, ""], "Failed!"
+    chunks = [prompt[i : i + 3] for i in range(0, len(prompt), 3)]
+    assert "".join(p_compressor.compress_stream(chunks)) == comp_prompt, "Failed!"
+
+def test_punctuation_comp_protect_other_tags():
+    prompt = "Hi, <keep>see </tool> and <tool>, <image/> here.</keep> end."
+    p_compressor = PunctuationComp(protect_tag=["keep", "tool", "image"])
+    comp_prompt = "Hi see </tool> and <tool>, <image/> here. end"
+    assert p_compressor.run(prompt) == comp_prompt, "Failed!"
+    chunks = [prompt[i : i + 3] for i in range(0, len(prompt), 3)]
+    assert "".join(p_compressor.compress_stream(chunks)) == comp_prompt, "Failed!"
+    with pytest.raises(ParseError):
+        p_compressor.run("<keep>a <keep>b</keep></keep>")
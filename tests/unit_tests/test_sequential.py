@@ -1,6 +1,8 @@
 from tests.unit_tests import utils
+from prmpt.metric import TokenMetric
 from prmpt.pcomp import (
     AutocorrectComp,
+    FusedRuleComp,
     LemmatizerComp,
     PunctuationComp,
     Sequential,
@@ -17,3 +19,21 @@ def test_sequential():
     )
     compressed_prompt = p_compressor(prompt)
     assert len(compressed_prompt) > 0, "Failed!"
+
+
+def test_sequential_compiled():
+    prompt = utils.load_prompt("prompt1.txt")
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": f"{prompt} <keep>Keep, this!</keep>"},
+    ]
+
+    p_compressor = Sequential(
+        PunctuationComp(), FusedRuleComp(stopwords=["the"])
+    ).compile(metrics=[TokenMetric()], protect_tag="keep")
+    res = p_compressor(messages, json=True, skip_system=True)
+    expected = FusedRuleComp(stopwords=["the"]).compress(PunctuationComp().compress(prompt))
+    assert res.content[0]["content"] == prompt, "Failed!"
+    assert res.content[1]["content"] == f"{expected}Keep, this!", "Failed!"
+    assert messages[1]["content"].endswith("</keep>"), "Failed!"
+    assert len(res.metrics) == 1, "Failed!"
@@ -0,0 +1,23 @@
+from tests.unit_tests import utils
+from prmpt.metric import TokenMetric
+
+
+def test_token_metric():
+    prompt = utils.load_prompt("prompt1.txt")
+    metric = TokenMetric()
+    res = metric(prompt, prompt[: len(prompt) // 2])
+    assert 0 < res[metric.key] < 1, "Failed!"
+    assert metric("", "")[metric.key] == 0.0, "Failed!"
+
+
+def test_token_metric_batch_run():
+    prompt = utils.load_prompt("prompt1.txt")
+    metric = TokenMetric()
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": prompt},
+    ]
+    comp_messages = [messages[0], {"role": "user", "content": prompt[: len(prompt) // 2]}]
+    res = metric.batch_run(messages, comp_messages, skip_system=True, json=True)
+    assert res == metric.run(prompt, prompt[: len(prompt) // 2]), "Failed!"
+    assert metric.memo_key(prompt) in metric.memo, "Failed!"